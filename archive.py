@@ -0,0 +1,168 @@
+"""
+Append-only arkiv over rå API-svar (Places og Brreg) i Parquet.
+
+fetch_places og fetch_brreg_enheter legger hvert rått treff/enhet hit før de
+mappes til leads, slik at leadsettet kan avledes på nytt med gjeldende regler
+(se rebuild.py) uten å hente alt fra API-ene igjen.
+
+Layout (partisjonert per kilde og kjøredato, Hive-stil):
+    archive/source=places/date=2026-10-19/part-<tid>-<pid>-<nr>.parquet
+
+Hver rad er ett treff: fetched_at, source, area (sted/kommunenummer), query,
+radius, page, item_id og payload (rå JSON). Filene skrives med zstd og blir
+aldri endret etter at de er skrevet.
+
+Krever pyarrow; uten den er arkivet av. Slås av med RAW_ARCHIVE=0.
+"""
+
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import cassette
+from lazy_imports import available
+
+# pyarrow importeres først når arkivet faktisk skrives/leses (se _arrow)
+HAS_PYARROW = available("pyarrow")
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+
+# Antall rader som bufres før en ny part-fil skrives
+FLUSH_ROWS = 5000
+
+_ID_FIELDS = {"places": "id", "brreg": "organisasjonsnummer"}
+
+
+def _arrow():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    return pa, pq
+
+
+def _schema():
+    pa, _ = _arrow()
+    return pa.schema([
+        ("fetched_at", pa.timestamp("ms", tz="UTC")),
+        ("source", pa.string()),
+        ("area", pa.string()),
+        ("query", pa.string()),
+        ("radius", pa.int32()),
+        ("page", pa.int32()),
+        ("item_id", pa.string()),
+        ("payload", pa.string()),
+    ])
+
+
+def enabled() -> bool:
+    return HAS_PYARROW and os.getenv("RAW_ARCHIVE", "1") != "0" and not cassette.is_replaying()
+
+
+class ArchiveWriter:
+    def __init__(self, base_dir: str = ARCHIVE_DIR):
+        self.base_dir = base_dir
+        self.buffers: dict[tuple[str, str], list[dict]] = {}
+        self.lock = threading.Lock()
+        self.seq = 0
+
+    def append(self, source: str, area: str, items: list[dict], query: str | None = None,
+               radius: int | None = None, page: int | None = None):
+        now = datetime.now(timezone.utc)
+        id_field = _ID_FIELDS.get(source, "id")
+        rows = [
+            {
+                "fetched_at": now,
+                "source": source,
+                "area": str(area),
+                "query": query,
+                "radius": radius,
+                "page": page,
+                "item_id": str(item.get(id_field, "")),
+                "payload": json.dumps(item, ensure_ascii=False, separators=(",", ":")),
+            }
+            for item in items
+        ]
+        key = (source, now.strftime("%Y-%m-%d"))
+        with self.lock:
+            buffer = self.buffers.setdefault(key, [])
+            buffer.extend(rows)
+            if len(buffer) >= FLUSH_ROWS:
+                self._flush_key(key)
+
+    def _flush_key(self, key: tuple[str, str]):
+        rows = self.buffers.pop(key, [])
+        if not rows:
+            return
+        source, date = key
+        part_dir = os.path.join(self.base_dir, f"source={source}", f"date={date}")
+        os.makedirs(part_dir, exist_ok=True)
+        self.seq += 1
+        name = f"part-{datetime.now(timezone.utc):%H%M%S}-{os.getpid()}-{self.seq:04d}.parquet"
+        tmp_path = os.path.join(part_dir, f".{name}.tmp")
+        pa, pq = _arrow()
+        table = pa.Table.from_pylist(rows, schema=_schema())
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, os.path.join(part_dir, name))
+
+    def flush(self):
+        with self.lock:
+            for key in list(self.buffers):
+                self._flush_key(key)
+
+
+_writer: ArchiveWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def append(source: str, area: str, items: list[dict], **meta):
+    """Legg rå treff i arkivet (ingen effekt hvis arkivet er av)."""
+    global _writer
+    if not items or not enabled():
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = ArchiveWriter()
+    _writer.append(source, area, items, **meta)
+
+
+@atexit.register
+def flush():
+    if _writer is not None:
+        _writer.flush()
+
+
+def iter_records(source: str, date_from: str | None = None, date_to: str | None = None,
+                 base_dir: str | None = None):
+    """
+    Les arkiverte rader for en kilde, eventuelt avgrenset til datoer (YYYY-MM-DD).
+    Gir dict med area, query, fetched_at og item (dekodet payload).
+    """
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow er ikke installert – kan ikke lese arkivet")
+    _, pq = _arrow()
+    pattern = os.path.join(base_dir or ARCHIVE_DIR, f"source={source}", "date=*", "*.parquet")
+    for path in sorted(glob.glob(pattern)):
+        date = os.path.basename(os.path.dirname(path)).split("=", 1)[1]
+        if (date_from and date < date_from) or (date_to and date > date_to):
+            continue
+        table = pq.read_table(path, columns=["fetched_at", "area", "query", "item_id", "payload"])
+        for row in table.to_pylist():
+            row["item"] = json.loads(row.pop("payload"))
+            yield row
+
+
+def latest_items(source: str, date_from: str | None = None, date_to: str | None = None,
+                 base_dir: str | None = None) -> list[dict]:
+    """Siste arkiverte versjon av hvert treff (per item_id), med area fra samme rad."""
+    latest: dict[str, dict] = {}
+    for row in iter_records(source, date_from, date_to, base_dir):
+        key = row["item_id"] or json.dumps(row["item"], sort_keys=True)
+        current = latest.get(key)
+        if current is None or row["fetched_at"] >= current["fetched_at"]:
+            latest[key] = row
+    return list(latest.values())
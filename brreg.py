@@ -10,30 +10,41 @@ API: https://data.brreg.no/enhetsregisteret/api/enheter (åpen, gratis, ingen au
 
 Kjør:
     python brreg.py
+    python brreg.py --deadline 5     # stopp etter 5 min, skriv og importer det som er ferdig
+    python brreg.py --profile        # minne/tid per steg til public/leads-brreg.profile.json
 """
 
+from __future__ import annotations
+
+import argparse
 import json
 import os
+import time
 from datetime import datetime, timedelta
 
-import requests
-
-try:
-    from supabase import create_client
-except ImportError:
-    create_client = None
-
 from dotenv import load_dotenv
 
+import archive
+import budget
+import cassette
+import deadline
+import profiling
+import regions
+from email_enrichment import enrich_leads
+import http_client
+from http_client import get_client
+from lazy_imports import create_client
+
 load_dotenv()
 
 API_URL = "https://data.brreg.no/enhetsregisteret/api/enheter"
 
-# Kommunenumre
-KOMMUNER = {
-    "3203": "ASKER",
-    "3024": "BÆRUM",
-}
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "public", "leads-brreg.json")
+
+# Kommunenumre (fra regionsettet i regions.json, se REGION_SET)
+_REGIONS = regions.load_regions()
+KOMMUNER = regions.kommuner(_REGIONS)
+KOMMUNE_BONUS = regions.kommune_bonus(_REGIONS)
 
 # NACE-koder som er relevante for lokale tjenestebedrifter
 RELEVANTE_NACE = {
@@ -68,17 +79,28 @@ RELEVANTE_NACE = {
 TOP_N = 20
 
 
-def get_blacklisted_ids() -> set[str]:
+def use_regions(region_list: list[dict]):
+    """Bytt regionsett ved kjøretid (f.eks. shards.py --set), inkl. lokasjonsbonus."""
+    global _REGIONS, KOMMUNER, KOMMUNE_BONUS
+    _REGIONS = region_list
+    KOMMUNER = regions.kommuner(region_list)
+    KOMMUNE_BONUS = regions.kommune_bonus(region_list)
+
+
+def get_blacklisted_ids(client=None) -> set[str]:
     """Hent alle eksisterende lead-IDer fra Supabase for svartelisting."""
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key or not create_client:
+    configured = bool(url and key and create_client)
+    if client is None and not cassette.available("supabase", "leads.select(id)", configured):
         print("  Supabase ikke konfigurert – ingen svartelisting")
         return set()
     try:
-        client = create_client(url, key)
-        result = client.table("leads").select("id").execute()
-        ids = {row["id"] for row in (result.data or [])}
+        def fetch():
+            result = (client or create_client(url, key)).table("leads").select("id").execute()
+            return result.data or []
+
+        ids = {row["id"] for row in cassette.call("supabase", "leads.select(id)", fetch)}
         print(f"  Svarteliste: {len(ids)} eksisterende leads i Supabase")
         return ids
     except Exception as e:
@@ -123,17 +145,14 @@ def calculate_score(enhet: dict, kommune_nr: str) -> int:
         score += 20
 
     # Lokasjon
-    if kommune_nr == "3203":
-        score += 20  # Asker
-    elif kommune_nr == "3024":
-        score += 15  # Bærum
+    score += KOMMUNE_BONUS.get(kommune_nr, 0)
 
     # Registreringsdato
     reg_dato = enhet.get("registreringsdatoEnhetsregisteret", "")
     if reg_dato:
         try:
             reg = datetime.strptime(reg_dato, "%Y-%m-%d")
-            dager = (datetime.now() - reg).days
+            dager = (cassette.now() - reg).days
             if dager <= 30:
                 score += 10
             elif dager <= 90:
@@ -185,18 +204,72 @@ def generate_info(enhet: dict) -> str:
     return " ".join(parts)
 
 
-def fetch_brreg_enheter(blacklisted_ids: set[str]) -> list[dict]:
+def enhet_to_lead(enhet: dict, kommune_nr: str, kommune_navn: str, blacklisted_ids: set[str]) -> dict | None:
+    """Filtrer og map en rå Brreg-enhet til et lead. None hvis den ikke kvalifiserer."""
+    org_nr = str(enhet.get("organisasjonsnummer", ""))
+
+    # Skip svartelistede
+    if org_nr in blacklisted_ids:
+        return None
+
+    # Må ha kontaktinfo (telefon/mobil/epost)
+    telefon = enhet.get("telefon") or enhet.get("mobil") or ""
+    epost = enhet.get("epostadresse") or ""
+    if not telefon and not epost:
+        return None
+
+    # Ekskluder de med hjemmeside
+    if enhet.get("hjemmeside"):
+        return None
+
+    # Formater adresse
+    forretningsadresse = enhet.get("forretningsadresse", {})
+    adresse = format_address(forretningsadresse)
+
+    # NACE/bransje
+    nace = enhet.get("naeringskode1", {})
+    industry = nace.get("beskrivelse", "Annet")
+
+    # Score
+    score = calculate_score(enhet, kommune_nr)
+
+    return {
+        "id": org_nr,
+        "name": enhet.get("navn", ""),
+        "address": adresse,
+        "rating": 0,
+        "userRatingCount": 0,
+        "industry": industry,
+        "phone": telefon,
+        "sted": kommune_navn,
+        "hasWebsite": False,
+        "potentialScore": score,
+        "info": generate_info(enhet),
+        "source": "brreg",
+        "status": "pending",
+        "notes": epost if epost else "",
+    }
+
+
+def fetch_brreg_enheter(blacklisted_ids: set[str], kommuner: dict[str, str] | None = None) -> list[dict]:
     """Hent enheter fra Brreg API for Asker og Bærum, registrert siste 6 mnd."""
-    fra_dato = (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d")
+    # Kjøringens dato (fra kassetten ved avspilling), ellers treffer ikke nøkkelen en annen dag
+    fra_dato = (cassette.now() - timedelta(days=180)).strftime("%Y-%m-%d")
     all_leads = []
 
-    for kommune_nr, kommune_navn in KOMMUNER.items():
+    kommuner = kommuner or KOMMUNER
+    run_deadline = deadline.current()
+    for kommune_nr, kommune_navn in kommuner.items():
         print(f"\n  --- {kommune_navn} (kommune {kommune_nr}) ---")
 
         page = 0
         total_fetched = 0
 
         while True:
+            if not run_deadline.affords("brreg"):
+                print("  Tidsfrist: stopper hentingen fra Brreg")
+                break
+            start = time.monotonic()
             params = {
                 "kommunenummer": kommune_nr,
                 "fraRegistreringsdatoEnhetsregisteret": fra_dato,
@@ -204,7 +277,11 @@ def fetch_brreg_enheter(blacklisted_ids: set[str]) -> list[dict]:
                 "page": page,
             }
 
-            resp = requests.get(API_URL, params=params)
+            try:
+                resp = get_client("brreg").get(API_URL, params=params)
+            except http_client.RequestException as e:
+                print(f"  API-kall feilet: {e}")
+                break
             if resp.status_code != 200:
                 print(f"  API error {resp.status_code}: {resp.text[:200]}")
                 break
@@ -217,74 +294,67 @@ def fetch_brreg_enheter(blacklisted_ids: set[str]) -> list[dict]:
 
             total_fetched += len(enheter)
 
+            archive.append("brreg", kommune_nr, enheter, page=page)
+
             for enhet in enheter:
-                org_nr = str(enhet.get("organisasjonsnummer", ""))
-
-                # Skip svartelistede
-                if org_nr in blacklisted_ids:
-                    continue
-
-                # Må ha kontaktinfo (telefon/mobil/epost)
-                telefon = enhet.get("telefon") or enhet.get("mobil") or ""
-                epost = enhet.get("epostadresse") or ""
-                if not telefon and not epost:
-                    continue
-
-                # Ekskluder de med hjemmeside
-                if enhet.get("hjemmeside"):
-                    continue
-
-                # Formater adresse
-                forretningsadresse = enhet.get("forretningsadresse", {})
-                adresse = format_address(forretningsadresse)
-
-                # NACE/bransje
-                nace = enhet.get("naeringskode1", {})
-                industry = nace.get("beskrivelse", "Annet")
-
-                # Score
-                score = calculate_score(enhet, kommune_nr)
-
-                lead = {
-                    "id": org_nr,
-                    "name": enhet.get("navn", ""),
-                    "address": adresse,
-                    "rating": 0,
-                    "userRatingCount": 0,
-                    "industry": industry,
-                    "phone": telefon,
-                    "sted": kommune_navn,
-                    "hasWebsite": False,
-                    "potentialScore": score,
-                    "info": generate_info(enhet),
-                    "source": "brreg",
-                    "status": "pending",
-                    "notes": epost if epost else "",
-                }
-
-                all_leads.append(lead)
+                lead = enhet_to_lead(enhet, kommune_nr, kommune_navn, blacklisted_ids)
+                if lead is not None:
+                    all_leads.append(lead)
 
             # Sjekk om det finnes flere sider
             total_pages = data.get("page", {}).get("totalPages", 1)
             page += 1
+            run_deadline.stats.observe_stage("brreg", time.monotonic() - start)
             if page >= total_pages:
                 break
 
-        print(f"  Hentet {total_fetched} enheter, {len([l for l in all_leads if KOMMUNER.get(kommune_nr, '') == l.get('sted')])} kvalifiserte leads for {kommune_navn}")
+        print(f"  Hentet {total_fetched} enheter, {len([l for l in all_leads if kommuner.get(kommune_nr, '') == l.get('sted')])} kvalifiserte leads for {kommune_navn}")
 
     return all_leads
 
 
+def enrich_by_score(leads: list[dict]) -> list[dict]:
+    """
+    Tidsfrist-variant av steg 3: valider e-post i bolker på TOP_N, høyest
+    score først, så lenge det er tid. Returnerer leadene som ble validert.
+    """
+    run_deadline = deadline.current()
+    leads = sorted(leads, key=lambda l: -l["potentialScore"])
+    enriched = []
+    for i in range(0, len(leads), TOP_N):
+        chunk = leads[i:i + TOP_N]
+        if not run_deadline.affords("enrich", len(chunk)):
+            print(f"  Tidsfrist: {len(leads) - i} leads ble ikke validert og tas ikke med")
+            break
+        start = time.monotonic()
+        enrich_leads(chunk)
+        run_deadline.stats.observe_stage("enrich", time.monotonic() - start, len(chunk))
+        enriched.extend(chunk)
+    return enriched
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Hent nyregistrerte bedrifter fra Brreg.")
+    parser.add_argument("--deadline", type=float, metavar="MIN",
+                        help="Stopp etter MIN minutter; skriv og importer leads som er ferdigbehandlet")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mål minne og tid per steg (rapport ved siden av leads-brreg.json)")
+    args = parser.parse_args()
+    run_deadline = deadline.start(args.deadline)
+    if args.profile:
+        profiling.enable(OUTPUT_PATH)
+
     print("=== Brreg Leads Generator (Asker + Bærum) ===\n")
 
     # Steg 1: Svartelisting fra Supabase
     print("Steg 1: Henter svarteliste fra Supabase...")
-    blacklisted_ids = get_blacklisted_ids()
+    with profiling.stage("svarteliste"):
+        blacklisted_ids = get_blacklisted_ids()
 
     # Steg 2: Hent leads fra Brreg
     print(f"\nSteg 2: Henter nye bedrifter fra Brønnøysundregistrene...")
-    all_leads = fetch_brreg_enheter(blacklisted_ids)
+    with profiling.stage("brreg"):
+        all_leads = fetch_brreg_enheter(blacklisted_ids)
 
     if not all_leads:
         print("\nIngen kvalifiserte leads funnet.")
@@ -293,41 +363,63 @@ def main():
 
     print(f"\nFant totalt {len(all_leads)} kvalifiserte leads")
 
-    # Steg 3: Sorter etter score og ta topp N
+    # Steg 3: Valider e-post og nedprioriter døde e-postdomener
+    print("\nSteg 3: Validerer e-postadresser (MX-oppslag)...")
+    with profiling.stage("e-post"):
+        if run_deadline.enabled:
+            all_leads = enrich_by_score(all_leads)
+        else:
+            enrich_leads(all_leads)
+
+    # Steg 4: Sorter etter score og ta topp N
     all_leads.sort(key=lambda l: -l["potentialScore"])
     top_leads = all_leads[:TOP_N]
+    if not top_leads:
+        print("\nIngen leads ble ferdigbehandlet før tidsfristen.")
+        write_results([])
+        return
 
     print(f"Topp {len(top_leads)} leads valgt (score {top_leads[0]['potentialScore']}–{top_leads[-1]['potentialScore']})")
 
-    # Steg 4: Skriv til JSON
-    write_results(top_leads)
+    # Steg 5: Skriv til JSON
+    with profiling.stage("skriv"):
+        write_results(top_leads)
 
-    # Steg 5: Importer direkte til Supabase
-    import_to_supabase(top_leads)
+    # Steg 6: Importer direkte til Supabase
+    with profiling.stage("import"):
+        import_to_supabase(top_leads)
+    if not cassette.is_replaying():
+        run_deadline.stats.save()
+    budget.current().report()
 
 
-def write_results(leads: list[dict]):
-    out_path = os.path.join(os.path.dirname(__file__), "public", "leads-brreg.json")
+def write_results(leads: list[dict], out_path: str | None = None):
+    out_path = out_path or OUTPUT_PATH
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(leads, f, ensure_ascii=False, indent=2)
     print(f"\nSkrev {len(leads)} leads til {out_path}")
 
 
-def import_to_supabase(leads: list[dict]):
-    """Importer leads direkte til Supabase."""
+def import_to_supabase(leads: list[dict], client=None) -> list[str]:
+    """Importer leads direkte til Supabase. Returnerer IDene som ble lagt til."""
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key or not create_client:
+    configured = bool(url and key and create_client)
+    if client is None and not cassette.available("supabase", "leads.select(id, status)", configured):
         print("\n⚠️  Supabase ikke konfigurert – hopper over import")
-        return
+        return []
 
-    client = create_client(url, key)
+    if client is None and not cassette.is_replaying():
+        client = create_client(url, key)
 
     # Hent eksisterende leads for å unngå duplikater
     FINAL_STATUSES = {"accepted", "rejected"}
-    result = client.table("leads").select("id, status").execute()
-    existing = {row["id"]: (row.get("status") or "pending") for row in (result.data or [])}
+    rows = cassette.call(
+        "supabase", "leads.select(id, status)",
+        lambda: client.table("leads").select("id, status").execute().data or [],
+    )
+    existing = {row["id"]: (row.get("status") or "pending") for row in rows}
 
     # Konverter feltnavn til snake_case for DB
     to_insert = []
@@ -349,8 +441,8 @@ def import_to_supabase(leads: list[dict]):
             "has_website": lead["hasWebsite"],
             "potential_score": lead["potentialScore"],
             "info": lead["info"],
-            "source": lead["source"],
-            "status": lead["status"],
+            "source": lead.get("source", "google_places"),
+            "status": lead.get("status", "pending"),
             "notes": lead.get("notes", ""),
         }
         to_insert.append(db_lead)
@@ -360,16 +452,21 @@ def import_to_supabase(leads: list[dict]):
 
     if not to_insert:
         print("📭 Ingen nye leads å importere til Supabase")
-        return
+        return []
 
     print(f"\n📤 Importerer {len(to_insert)} nye leads til Supabase...")
     batch_size = 100
     for i in range(0, len(to_insert), batch_size):
         batch = to_insert[i:i + batch_size]
-        client.table("leads").insert(batch).execute()
+        # I avspillingsmodus skrives ingenting til Supabase
+        cassette.call(
+            "supabase", ["leads.insert", [l["id"] for l in batch]],
+            lambda: len(client.table("leads").insert(batch).execute().data or []),
+        )
         print(f"   ✓ La til {len(batch)} leads (batch {i // batch_size + 1})")
 
-    print(f"✅ {len(to_insert)} nye brreg-leads importert til Supabase!")
+    print(f"✅ {len(to_insert)} nye leads importert til Supabase!")
+    return [lead["id"] for lead in to_insert]
 
 
 if __name__ == "__main__":
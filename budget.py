@@ -0,0 +1,184 @@
+"""
+Budsjett og kostnadsregnskap per kjøring.
+
+Alle eksterne kall meteres per API og SKU (Places-SKU avledes fra
+X-Goog-FieldMask), Gemini-tokens telles fra usageMetadata, og kostnaden
+estimeres løpende. Når et konfigurert budsjett er nådd, degraderer stegene
+i stedet for å feile: Places-søket stopper, info-tekst faller tilbake til
+_generate_info_template og verifiseringen hopper over Google-søket.
+
+Grenser settes med miljøvariabler (tom = ubegrenset):
+    RUN_BUDGET_USD=5.0          total estimert kostnad per kjøring
+    PLACES_MAX_REQUESTS=500     antall Places-søk
+    GEMINI_MAX_CALLS=200        antall Gemini-kall
+    SEARCH_MAX_QUERIES=300      antall Google-søk i verifiseringen
+
+Prisene er estimater (USD) og bør holdes i takt med Googles prisliste.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+# Places Text Search – pris per 1000 forespørsler etter dyreste felt i feltmasken
+PLACES_SKU_PRICES = {
+    "text_search_pro": 32.0,
+    "text_search_enterprise": 35.0,
+    "text_search_enterprise_atmosphere": 40.0,
+}
+
+PLACES_ENTERPRISE_FIELDS = {
+    "rating", "userRatingCount", "nationalPhoneNumber", "internationalPhoneNumber",
+    "websiteUri", "regularOpeningHours", "currentOpeningHours", "priceLevel",
+}
+PLACES_ATMOSPHERE_FIELDS = {
+    "editorialSummary", "reviews", "generativeSummary", "takeout", "delivery",
+    "dineIn", "servesBreakfast", "servesLunch", "servesDinner",
+}
+
+# Gemini 2.0 Flash – pris per million tokens
+GEMINI_PRICE_INPUT = 0.10
+GEMINI_PRICE_OUTPUT = 0.40
+
+LIMIT_ENV = {
+    "places": "PLACES_MAX_REQUESTS",
+    "gemini": "GEMINI_MAX_CALLS",
+    "search": "SEARCH_MAX_QUERIES",
+}
+
+
+def _env_number(name: str, cast=float):
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"  Ugyldig verdi for {name}: {value!r} (ignoreres)")
+        return None
+
+
+def places_sku(field_mask: str) -> str:
+    """Finn Places-SKU ut fra feltmasken (dyreste felt bestemmer)."""
+    fields = {f.strip().split(".", 1)[-1].split(".", 1)[0] for f in (field_mask or "").split(",") if f.strip()}
+    if fields & PLACES_ATMOSPHERE_FIELDS:
+        return "text_search_enterprise_atmosphere"
+    if fields & PLACES_ENTERPRISE_FIELDS:
+        return "text_search_enterprise"
+    return "text_search_pro"
+
+
+class RunBudget:
+    def __init__(self, max_cost: float | None = None, limits: dict[str, int] | None = None):
+        self.max_cost = max_cost
+        self.limits = limits or {}
+        self.calls: dict[tuple[str, str], int] = {}
+        self.gemini_tokens = {"input": 0, "output": 0}
+        self.exhausted: set[str] = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RunBudget":
+        limits = {api: _env_number(env, int) for api, env in LIMIT_ENV.items()}
+        return cls(_env_number("RUN_BUDGET_USD"), {k: v for k, v in limits.items() if v is not None})
+
+    def record(self, api: str, sku: str = "", count: int = 1):
+        with self.lock:
+            self.calls[(api, sku)] = self.calls.get((api, sku), 0) + count
+
+    def record_http(self, api: str, kwargs: dict, resp: requests.Response):
+        """Meter et HTTP-kall fra http_client. Kun vellykkede kall faktureres."""
+        if resp.status_code >= 400:
+            self.record(api, "feilet")
+            return
+        sku = ""
+        if api == "places":
+            sku = places_sku((kwargs.get("headers") or {}).get("X-Goog-FieldMask", ""))
+        self.record(api, sku)
+
+    def record_gemini_usage(self, data: dict):
+        usage = data.get("usageMetadata") or {}
+        with self.lock:
+            self.gemini_tokens["input"] += usage.get("promptTokenCount", 0)
+            self.gemini_tokens["output"] += usage.get("candidatesTokenCount", 0)
+
+    def count(self, api: str) -> int:
+        with self.lock:
+            return sum(n for (a, sku), n in self.calls.items() if a == api and sku != "feilet")
+
+    def _costs(self) -> dict[str, float]:
+        costs = {}
+        for (api, sku), n in self.calls.items():
+            if api == "places" and sku in PLACES_SKU_PRICES:
+                costs[f"places/{sku}"] = n * PLACES_SKU_PRICES[sku] / 1000
+        costs["gemini/tokens"] = (
+            self.gemini_tokens["input"] * GEMINI_PRICE_INPUT
+            + self.gemini_tokens["output"] * GEMINI_PRICE_OUTPUT
+        ) / 1_000_000
+        return costs
+
+    def cost(self) -> float:
+        with self.lock:
+            return sum(self._costs().values())
+
+    def allow(self, api: str) -> bool:
+        """Om et nytt kall mot api er innenfor budsjettet. Melder fra én gang per API."""
+        reason = None
+        limit = self.limits.get(api)
+        if limit is not None and self.count(api) >= limit:
+            reason = f"grensen på {limit} kall"
+        elif self.max_cost is not None and api in ("places", "gemini") and self.cost() >= self.max_cost:
+            reason = f"kostnadsbudsjettet på ${self.max_cost:.2f}"
+        if reason is None:
+            return True
+        with self.lock:
+            first = api not in self.exhausted
+            self.exhausted.add(api)
+        if first:
+            print(f"  ⚠️  Budsjett: {api} har nådd {reason} – degraderer")
+        return False
+
+    def report(self):
+        """Skriv kostnadsoversikt for kjøringen."""
+        with self.lock:
+            calls = dict(self.calls)
+            costs = self._costs()
+            tokens = dict(self.gemini_tokens)
+        print("\n=== Kostnadsoversikt (estimat) ===")
+        for (api, sku), n in sorted(calls.items()):
+            label = f"{api}/{sku}" if sku else api
+            cost = costs.get(label)
+            print(f"  {label:<45} {n:>6} kall" + (f"   ${cost:.3f}" if cost is not None else ""))
+        if tokens["input"] or tokens["output"]:
+            print(f"  {'gemini/tokens':<45} {tokens['input']:>6} inn / {tokens['output']} ut   ${costs['gemini/tokens']:.3f}")
+        total = sum(costs.values())
+        limit = f" av ${self.max_cost:.2f}" if self.max_cost is not None else ""
+        print(f"  {'Totalt':<45} ${total:.3f}{limit}")
+        if self.exhausted:
+            print(f"  Budsjett nådd for: {', '.join(sorted(self.exhausted))}")
+
+
+_current: RunBudget | None = None
+_current_lock = threading.Lock()
+
+
+def current() -> RunBudget:
+    """Budsjettet for pågående kjøring (opprettes fra miljøet ved første bruk)."""
+    global _current
+    with _current_lock:
+        if _current is None:
+            _current = RunBudget.from_env()
+        return _current
+
+
+def reset(budget: RunBudget | None = None) -> RunBudget:
+    """Start et nytt budsjett, f.eks. per jobb i daemon-modus."""
+    global _current
+    with _current_lock:
+        _current = budget or RunBudget.from_env()
+        return _current
@@ -0,0 +1,257 @@
+"""
+Opptak og avspilling av API-trafikk (Places, Gemini, Brreg, Google-søk,
+Supabase og MX-oppslag) for deterministiske, raske gjenkjøringer uten nett.
+
+Kassetten er et komprimert zip-arkiv der hver interaksjon er et eget medlem
+(`<api>/<nøkkel>/<løpenr>.json`). Zip-katalogen fungerer som indeks, så
+avspilling slår opp svar direkte uten å lese hele arkivet. Nøkkelen er en
+hash av metode, URL, parametre og body – ikke headere, så API-nøkler havner
+aldri i kassetten.
+
+Styres med miljøvariabler:
+    CASSETTE_MODE=record|replay   (tom = av)
+    CASSETTE=cassettes/run.zip    (sti til kassetten)
+
+Kjøringens tidspunkt (now()) lagres også, slik at datoavhengige parametre
+(f.eks. Brregs fraRegistreringsdato) og scoring blir like ved avspilling en
+annen dag.
+
+shards.py bruker én kassett per shard (run.shard-003.zip, se use_part), så
+prosesser i en pool ikke skriver over hverandres opptak.
+
+Kjør:
+    CASSETTE_MODE=record python leads.py   # ta opp en full kjøring
+    CASSETTE_MODE=replay python leads.py   # spill av lokalt, uten ventetid
+"""
+
+from __future__ import annotations
+
+import atexit
+import base64
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from lazy_imports import request_error
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes", "run.zip")
+
+
+def _cassette_miss() -> type:
+    return request_error(__name__, "CassetteMiss", "Kastes i avspillingsmodus når en forespørsel ikke finnes i kassetten.")
+
+
+def __getattr__(name: str):
+    # Arver requests.RequestException, men lages først når den trengs (se lazy_imports)
+    if name == "CassetteMiss":
+        return _cassette_miss()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def request_key(*parts) -> str:
+    """Stabil nøkkel for en interaksjon (hash av kanonisk JSON)."""
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Ukjent kassettmodus: {mode}")
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.counters: dict[str, int] = {}
+        self.started_at: datetime | None = None
+        # Arvet via fork skal zip-filen ikke lukkes (og skrives) av barneprosessen
+        self.pid = os.getpid()
+        if mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.zf = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+            self.index: dict[str, list[str]] = {}
+        else:
+            self.zf = zipfile.ZipFile(path, "r")
+            self.index = {}
+            for name in sorted(self.zf.namelist()):
+                self.index.setdefault(name.rsplit("/", 1)[0], []).append(name)
+        print(f"  Kassett ({mode}): {path}")
+
+    def _prefix(self, kind: str, key: str) -> str:
+        return f"{kind}/{key}"
+
+    def put(self, kind: str, key: str, payload: dict):
+        prefix = self._prefix(kind, key)
+        with self.lock:
+            seq = len(self.index.setdefault(prefix, []))
+            name = f"{prefix}/{seq:04d}.json"
+            self.index[prefix].append(name)
+            self.zf.writestr(name, json.dumps(payload, ensure_ascii=False))
+
+    def has(self, kind: str, key: str) -> bool:
+        with self.lock:
+            return bool(self.index.get(self._prefix(kind, key)))
+
+    def get(self, kind: str, key: str) -> dict:
+        """Neste opptak for nøkkelen; gjentatte kall spilles av i rekkefølge (siste gjentas)."""
+        prefix = self._prefix(kind, key)
+        with self.lock:
+            names = self.index.get(prefix)
+            if not names:
+                raise _cassette_miss()(f"Ingen opptak for {kind} ({key}) i {self.path}")
+            seq = self.counters.get(prefix, 0)
+            self.counters[prefix] = seq + 1
+            data = self.zf.read(names[min(seq, len(names) - 1)])
+        return json.loads(data)
+
+    def close(self):
+        with self.lock:
+            if self.zf is not None and self.pid == os.getpid():
+                self.zf.close()
+            self.zf = None
+
+
+_active: Cassette | None = None
+_active_lock = threading.Lock()
+_configured = False
+
+
+def use(path: str | None, mode: str | None) -> Cassette | None:
+    """Aktiver (eller slå av med mode=None) en kassett for resten av prosessen."""
+    global _active, _configured
+    with _active_lock:
+        if _active is not None:
+            _active.close()
+        _active = Cassette(path or DEFAULT_PATH, mode) if mode else None
+        _configured = True
+        return _active
+
+
+def use_part(part: str) -> Cassette | None:
+    """
+    Bytt til en egen kassettfil for en del av kjøringen (run.zip -> run.<part>.zip),
+    f.eks. per shard. Ingen effekt når CASSETTE_MODE ikke er satt.
+    """
+    mode = os.getenv("CASSETTE_MODE") or None
+    if not mode:
+        return None
+    root, ext = os.path.splitext(os.getenv("CASSETTE") or DEFAULT_PATH)
+    return use(f"{root}.{part}{ext}", mode)
+
+
+def active() -> Cassette | None:
+    if not _configured:
+        mode = os.getenv("CASSETTE_MODE") or None
+        use(os.getenv("CASSETTE"), mode)
+    return _active
+
+
+def is_recording() -> bool:
+    c = active()
+    return c is not None and c.mode == "record"
+
+
+def is_replaying() -> bool:
+    c = active()
+    return c is not None and c.mode == "replay"
+
+
+def _http_key(api: str, method: str, url: str, kwargs: dict) -> str:
+    return request_key(api, method.upper(), url, kwargs.get("params"), kwargs.get("json"), kwargs.get("data"))
+
+
+def record_http(api: str, method: str, url: str, kwargs: dict, resp: requests.Response):
+    c = active()
+    if c is None or c.mode != "record":
+        return
+    payload = {
+        "request": {"method": method.upper(), "url": url, "params": kwargs.get("params"), "json": kwargs.get("json")},
+        "status": resp.status_code,
+        "headers": dict(resp.headers),
+        "url": resp.url,
+    }
+    try:
+        payload["text"] = resp.content.decode("utf-8")
+    except UnicodeDecodeError:
+        payload["body_b64"] = base64.b64encode(resp.content).decode("ascii")
+    c.put(api, _http_key(api, method, url, kwargs), payload)
+
+
+def replay_http(api: str, method: str, url: str, kwargs: dict) -> requests.Response:
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    payload = active().get(api, _http_key(api, method, url, kwargs))
+    resp = requests.Response()
+    resp.status_code = payload["status"]
+    resp.headers = CaseInsensitiveDict(payload.get("headers") or {})
+    resp.url = payload.get("url") or url
+    resp.encoding = "utf-8"
+    if "body_b64" in payload:
+        resp._content = base64.b64decode(payload["body_b64"])
+    else:
+        resp._content = (payload.get("text") or "").encode("utf-8")
+    return resp
+
+
+def has_call(kind: str, key) -> bool:
+    """Om kassetten har opptak av kallet (kun meningsfullt ved avspilling)."""
+    c = active()
+    return c is not None and c.has(kind, request_key(kind, key))
+
+
+def available(kind: str, key, live: bool) -> bool:
+    """
+    Om et kall kan gjøres: ved avspilling kun hvis det ble tatt opp (f.eks. var
+    Supabase ikke satt opp under opptaket), ellers når live er sann.
+    """
+    return has_call(kind, key) if is_replaying() else live
+
+
+def call(kind: str, key, fn):
+    """
+    Ta opp/spill av et vilkårlig kall med JSON-serialiserbart resultat
+    (f.eks. Google-søk eller Supabase-spørringer).
+    """
+    c = active()
+    if c is None:
+        return fn()
+    digest = request_key(kind, key)
+    if c.mode == "replay":
+        return c.get(kind, digest)["result"]
+    result = fn()
+    c.put(kind, digest, {"key": key, "result": result})
+    return result
+
+
+_clock_lock = threading.Lock()
+
+
+def now() -> datetime:
+    """
+    Kjøringens "nå": tas opp én gang per kassett og spilles av derfra. Uten
+    kassett (eller med en kassett tatt opp før klokken ble lagret) er det
+    datetime.now().
+    """
+    c = active()
+    if c is None:
+        return datetime.now()
+    with _clock_lock:
+        if c.started_at is None:
+            if c.mode == "replay" and not has_call("clock", "now"):
+                c.started_at = datetime.now()
+            else:
+                c.started_at = datetime.fromisoformat(call("clock", "now", lambda: datetime.now().isoformat()))
+        return c.started_at
+
+
+@atexit.register
+def _close_active():
+    if _active is not None:
+        _active.close()
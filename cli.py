@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Felles inngangspunkt for lead-pipelinen.
+
+Underkommandoene importerer sine moduler først når de kjøres, og modulene
+importerer requests, supabase, dnspython osv. først ved første kall (se
+lazy_imports.py), så `--help`, tørrkjøringer og små shard-jobber starter
+raskt. Argumenter etter underkommandoen sendes videre til modulens main().
+
+Kjør:
+    python cli.py places                 # leads.py
+    python cli.py brreg                  # brreg.py
+    python cli.py import                 # import_to_supabase.py
+    python cli.py verify --budget 50     # reverify.py
+    python cli.py bench                  # mål oppstartstid
+"""
+
+import argparse
+import importlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# underkommando -> (modul, beskrivelse)
+COMMANDS = {
+    "places": ("leads", "Hent leads fra Google Places og verifiser dem"),
+    "brreg": ("brreg", "Hent nyregistrerte bedrifter fra Brreg"),
+    "import": ("import_to_supabase", "Importer public/*.json til Supabase"),
+    "verify": ("reverify", "Re-verifiser pending-leads i Supabase"),
+    "rescore": ("rescore", "Reberegn potential_score i Supabase"),
+    "daemon": ("daemon", "Kjør som langtkjørende tjeneste"),
+    "shards": ("shards", "Shardet kjøring over mange kommuner"),
+    "rebuild": ("rebuild", "Avled leads på nytt fra arkivet"),
+    "enrich": ("email_enrichment", "Valider e-post i public/leads-brreg.json"),
+    "regions": ("regions", "Vis eller generer regionsett"),
+    "geofence": ("geofence", "Kommunegrenser for geofence"),
+}
+
+# Moduler som ikke skal lastes av `cli.py --help` eller `cli.py <kommando> --help`
+# (sjekkes av bench)
+HEAVY_MODULES = ("requests", "urllib3", "supabase", "httpx", "pydantic", "googlesearch", "pyarrow", "dns")
+
+# Median oppstartstid for `cli.py --help` som regnes som regresjon (sekunder)
+STARTUP_THRESHOLD = 0.25
+
+# Median oppstartstid for `cli.py <kommando> --help` (laster hele modulgrafen)
+COMMAND_THRESHOLD = 0.5
+
+
+def run_command(name: str, args: list[str]):
+    module_name = COMMANDS[name][0]
+    module = importlib.import_module(module_name)
+    # Modulenes main() leser sys.argv selv
+    sys.argv = [f"{os.path.basename(sys.argv[0])} {name}", *args]
+    module.main()
+
+
+def _bench_one(args: list[str], runs: int, threshold: float) -> bool:
+    """Mål `cli.py <args>` og sjekk at tunge moduler ikke lastes. True hvis OK."""
+    script = os.path.abspath(__file__)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, *args], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+
+    probe = (
+        f"import contextlib, io, runpy, sys; sys.argv = ['cli.py', *{args!r}]\n"
+        "with contextlib.suppress(SystemExit), contextlib.redirect_stdout(io.StringIO()):\n"
+        f"    runpy.run_path({script!r}, run_name='__main__')\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    loaded = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True).stdout.strip()
+
+    median = statistics.median(timings)
+    label = " ".join(["cli.py", *args])
+    print(f"`{label}`: median {median * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, maks {max(timings) * 1000:.0f} ms ({runs} kjøringer)")
+    ok = True
+    if loaded:
+        print(f"  ❌ Tunge moduler lastet ved oppstart: {loaded}")
+        ok = False
+    if median > threshold:
+        print(f"  ❌ Median over terskel på {threshold * 1000:.0f} ms")
+        ok = False
+    return ok
+
+
+def bench(runs: int, threshold: float, command_threshold: float) -> int:
+    """Mål oppstartstid for `cli.py --help` og `cli.py <kommando> --help` for alle kommandoer."""
+    results = [_bench_one(["--help"], runs, threshold)]
+    for name in COMMANDS:
+        results.append(_bench_one([name, "--help"], runs, command_threshold))
+    if all(results):
+        print("✅ Innenfor terskel")
+        return 0
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="cli.py", description="AskerLeads lead-pipeline.")
+    sub = parser.add_subparsers(dest="command", metavar="KOMMANDO", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        # Egne flagg (også --help) sendes uendret videre til modulen
+        sub.add_parser(name, help=help_text, add_help=False)
+
+    p_bench = sub.add_parser("bench", help="Mål oppstartstid (regresjonsvakt)")
+    p_bench.add_argument("--runs", type=int, default=10)
+    p_bench.add_argument("--threshold", type=float, default=STARTUP_THRESHOLD, help="Sekunder for `cli.py --help`")
+    p_bench.add_argument("--command-threshold", type=float, default=COMMAND_THRESHOLD,
+                         help="Sekunder for `cli.py <kommando> --help`")
+
+    args, rest = parser.parse_known_args()
+    if args.command == "bench":
+        if rest:
+            parser.error(f"ukjente argumenter: {' '.join(rest)}")
+        sys.exit(bench(args.runs, args.threshold, args.command_threshold))
+    run_command(args.command, rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Langtkjørende tjenestemodus for lead-pipelinen.
+
+I stedet for engangskjøring av leads.py/brreg.py holder daemonen importer,
+HTTP-sesjoner (keep-alive), Supabase-klienten, svartelisten og
+verifiseringsresultater varme i minnet, og kjører hver kilde/område som en
+egen jobb med eget intervall. Jobber som gir mange nye leads oppdateres
+oftere; jobber som ikke gir noe, sjeldnere.
+
+Kjør:
+    python daemon.py            # kjører til Ctrl-C / SIGTERM
+    python daemon.py --once     # én runde over alle jobber, så avslutt
+"""
+
+import argparse
+import heapq
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+import archive
+import brreg
+import budget
+import leads
+from email_enrichment import enrich_leads
+from lazy_imports import create_client
+
+load_dotenv()
+
+# Grunnintervall per kilde (sekunder)
+PLACES_INTERVAL = 6 * 3600
+BRREG_INTERVAL = 2 * 3600
+MIN_INTERVAL = 30 * 60
+MAX_INTERVAL = 48 * 3600
+
+# Full oppfrisking av svartelisten fra Supabase
+BLACKLIST_REFRESH = 6 * 3600
+
+# Hvor lenge en "har nettside"-dom huskes før leadet kan sjekkes på nytt
+VERDICT_TTL = 7 * 24 * 3600
+
+# Glatting av utbytte (eksponentielt glidende snitt)
+YIELD_SMOOTHING = 0.5
+
+
+@dataclass(order=True)
+class Job:
+    next_run: float
+    name: str = field(compare=False)
+    source: str = field(compare=False)
+    area: str = field(compare=False)
+    base_interval: float = field(compare=False)
+    interval: float = field(compare=False, default=0.0)
+    avg_yield: float = field(compare=False, default=0.0)
+    runs: int = field(compare=False, default=0)
+
+
+class LeadDaemon:
+    def __init__(self):
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        self.client = create_client(url, key) if url and key and create_client else None
+        self.blacklist: set[str] = set()
+        self.blacklist_loaded_at = 0.0
+        self.verdicts: dict[str, bool] = {}
+        self.verdicts_loaded_at = time.monotonic()
+        self.stop_event = threading.Event()
+        self.jobs: list[Job] = []
+
+        now = time.monotonic()
+        for kommune_nr in leads.LOCATIONS:
+            self._add_job(f"places:{leads.KOMMUNE_NAVN[kommune_nr]}", "places", kommune_nr, PLACES_INTERVAL, now)
+        for kommune_nr, kommune_navn in brreg.KOMMUNER.items():
+            self._add_job(f"brreg:{kommune_navn}", "brreg", kommune_nr, BRREG_INTERVAL, now)
+
+    def _add_job(self, name: str, source: str, area: str, interval: float, now: float):
+        heapq.heappush(self.jobs, Job(now, name, source, area, interval, interval))
+
+    def refresh_blacklist(self, force: bool = False):
+        if not force and time.monotonic() - self.blacklist_loaded_at < BLACKLIST_REFRESH:
+            return
+        print("Oppfrisker svarteliste fra Supabase...")
+        if self.client is not None:
+            self.blacklist = leads.get_blacklisted_ids(self.client)
+        else:
+            self.blacklist = leads.get_blacklisted_ids()
+        self.blacklist_loaded_at = time.monotonic()
+
+    def _expire_verdicts(self):
+        if time.monotonic() - self.verdicts_loaded_at > VERDICT_TTL:
+            self.verdicts.clear()
+            self.verdicts_loaded_at = time.monotonic()
+
+    def _import(self, new_leads: list[dict]) -> int:
+        if not new_leads:
+            return 0
+        inserted = brreg.import_to_supabase(new_leads, self.client)
+        # Hold svartelisten varm uten å hente alt på nytt
+        self.blacklist.update(inserted)
+        return len(inserted)
+
+    def run_places(self, kommune_nr: str) -> int:
+        self._expire_verdicts()
+        # Treff med kjent nettside hoppes over allerede ved henting, så de ikke
+        # fyller opp TARGET_RESULTS-plassene kjøring etter kjøring
+        found = leads.fetch_places(
+            leads.KOMMUNE_NAVN[kommune_nr], leads.LOCATIONS[kommune_nr], self.blacklist, self.verdicts,
+        )
+        verified = leads.verify_leads(found, self.verdicts)
+        verified.sort(key=lambda l: (-l["rating"], -l["userRatingCount"]))
+        return self._import(leads.fill_info(verified))
+
+    def run_brreg(self, kommune_nr: str) -> int:
+        found = brreg.fetch_brreg_enheter(self.blacklist, {kommune_nr: brreg.KOMMUNER[kommune_nr]})
+        enrich_leads(found)
+        found.sort(key=lambda l: -l["potentialScore"])
+        return self._import(found[:brreg.TOP_N])
+
+    def reschedule(self, job: Job, new_leads: int):
+        """Juster intervallet etter utbytte: mange nye leads -> oftere."""
+        job.runs += 1
+        if job.runs == 1:
+            job.avg_yield = float(new_leads)
+        else:
+            job.avg_yield = YIELD_SMOOTHING * new_leads + (1 - YIELD_SMOOTHING) * job.avg_yield
+
+        all_yields = [j.avg_yield for j in self.jobs if j.runs] + [job.avg_yield]
+        mean_yield = sum(all_yields) / len(all_yields)
+        factor = (job.avg_yield + 1) / (mean_yield + 1)
+        job.interval = max(MIN_INTERVAL, min(job.base_interval / factor, MAX_INTERVAL))
+        job.next_run = time.monotonic() + job.interval
+        heapq.heappush(self.jobs, job)
+
+    def run_job(self, job: Job) -> int:
+        print(f"\n=== {job.name} (kjøring {job.runs + 1}) ===")
+        # Budsjettet gjelder per jobb i daemon-modus
+        run_budget = budget.reset()
+        self.refresh_blacklist()
+        try:
+            if job.source == "places":
+                return self.run_places(job.area)
+            return self.run_brreg(job.area)
+        finally:
+            run_budget.report()
+            archive.flush()
+
+    def run(self, once: bool = False):
+        self.refresh_blacklist(force=True)
+        pending_first_round = len(self.jobs)
+        while not self.stop_event.is_set():
+            job = heapq.heappop(self.jobs)
+            wait = job.next_run - time.monotonic()
+            if wait > 0:
+                heapq.heappush(self.jobs, job)
+                self.stop_event.wait(min(wait, 60))
+                continue
+
+            try:
+                new_leads = self.run_job(job)
+            except Exception as e:
+                print(f"  Jobb {job.name} feilet: {e}")
+                new_leads = 0
+
+            self.reschedule(job, new_leads)
+            print(f"  {job.name}: {new_leads} nye leads, neste kjøring om {job.interval / 60:.0f} min")
+
+            if once:
+                pending_first_round -= 1
+                if pending_first_round <= 0:
+                    break
+
+    def stop(self, *_):
+        print("\nStopper daemon etter pågående jobb...")
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kjør lead-pipelinen som en langtkjørende tjeneste.")
+    parser.add_argument("--once", action="store_true", help="Kjør hver jobb én gang og avslutt")
+    args = parser.parse_args()
+
+    print("=== AskerLeads daemon ===\n")
+    daemon = LeadDaemon()
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Tidsfrist for en kjøring (--deadline) og forventet utbytte per sekund.
+
+Med en tidsfrist planlegges arbeidet etter hva som gir flest ferdige leads
+per sekund: Places-søk med høyest historisk utbytte kjøres først, leads med
+høyest score verifiseres og beskrives først, og hentingen stopper når
+gjenværende tid bare så vidt rekker til å ferdigbehandle det som allerede er
+funnet. Når fristen nås, skrives og importeres det som er ferdigbehandlet.
+
+Utbytte (nye leads per side) og tidsbruk per søk og per steg lagres som
+glidende snitt i yield-stats.json, slik at neste kjøring starter med et godt
+estimat. Uten tidsfrist (standard) har modulen ingen effekt på rekkefølgen.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+
+STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "yield-stats.json")
+
+# Tid som holdes av til skriving og import etter siste steg (sekunder)
+RESERVE_SECONDS = 15
+
+# Startestimat for sekunder per enhet når historikk mangler
+DEFAULT_SECONDS = {
+    "places": 1.0,    # én side Places-søk
+    "brreg": 0.5,     # én side fra Brreg
+    "verify": 4.0,    # domenegjetting + Google-søk + pause
+    "info": 1.5,      # ett Gemini-kall
+    "enrich": 0.05,   # én MX-sjekk (parallelt)
+}
+
+# Startestimat for nye leads per Places-side når historikk mangler
+DEFAULT_YIELD = 2.0
+
+# Glatting av utbytte og tidsbruk (eksponentielt glidende snitt)
+SMOOTHING = 0.3
+
+
+def _ema(old: float | None, new: float) -> float:
+    return new if old is None else SMOOTHING * new + (1 - SMOOTHING) * old
+
+
+class YieldStats:
+    def __init__(self, queries: dict | None = None, stages: dict | None = None):
+        # query -> {"yield": nye leads per side, "seconds": sekunder per side}
+        self.queries: dict[str, dict[str, float]] = queries or {}
+        # steg -> sekunder per enhet
+        self.stages: dict[str, float] = stages or {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str | None = None) -> "YieldStats":
+        try:
+            with open(path or STATS_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data.get("queries"), data.get("stages"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls()
+
+    def save(self, path: str | None = None):
+        path = path or STATS_PATH
+        tmp_path = f"{path}.tmp"
+        with self.lock:
+            data = {"queries": self.queries, "stages": self.stages}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def observe_query(self, query: str, new_leads: int, seconds: float):
+        with self.lock:
+            entry = self.queries.setdefault(query, {})
+            entry["yield"] = _ema(entry.get("yield"), float(new_leads))
+            entry["seconds"] = _ema(entry.get("seconds"), seconds)
+        self.observe_stage("places", seconds)
+
+    def observe_stage(self, stage: str, seconds: float, count: int = 1):
+        if count <= 0:
+            return
+        with self.lock:
+            self.stages[stage] = _ema(self.stages.get(stage), seconds / count)
+
+    def stage_seconds(self, stage: str) -> float:
+        with self.lock:
+            return self.stages.get(stage, DEFAULT_SECONDS.get(stage, 1.0))
+
+    def query_rate(self, query: str) -> float:
+        """Forventede nye leads per sekund for et søk. Ukjente søk får snittet (utforskes)."""
+        with self.lock:
+            entry = self.queries.get(query)
+            if entry is None:
+                known = [e["yield"] / max(e["seconds"], 0.1) for e in self.queries.values()]
+                return sum(known) / len(known) if known else DEFAULT_YIELD / DEFAULT_SECONDS["places"]
+            return entry["yield"] / max(entry["seconds"], 0.1)
+
+
+class Deadline:
+    def __init__(self, seconds: float | None = None, stats: YieldStats | None = None):
+        self.end = time.monotonic() + seconds if seconds else None
+        self.stats = stats or YieldStats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.end is not None
+
+    def remaining(self) -> float:
+        if self.end is None:
+            return float("inf")
+        return self.end - time.monotonic() - RESERVE_SECONDS
+
+    def affords(self, stage: str, count: int = 1) -> bool:
+        """Om det er tid til count enheter av et steg før fristen (alltid True uten frist)."""
+        return self.remaining() >= self.stats.stage_seconds(stage) * count
+
+    def backlog_seconds(self, pending: int) -> float:
+        """Estimert tid for å verifisere og beskrive pending funne leads."""
+        return pending * (self.stats.stage_seconds("verify") + self.stats.stage_seconds("info"))
+
+
+_current = Deadline()
+_current_lock = threading.Lock()
+
+
+def current() -> Deadline:
+    """Tidsfristen for pågående kjøring (ingen frist som standard)."""
+    with _current_lock:
+        return _current
+
+
+def start(minutes: float | None, stats: YieldStats | None = None) -> Deadline:
+    """Start en ny tidsfrist (minutter fra nå), med utbyttehistorikk fra yield-stats.json."""
+    global _current
+    with _current_lock:
+        _current = Deadline(minutes * 60 if minutes else None, stats or YieldStats.load())
+        return _current
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+E-postberiking av leads: normaliserer og validerer e-postadresser, og sjekker
+at domenet faktisk tar imot e-post (MX-oppslag).
+
+Oppslagene kjøres samlet per unikt domene, i batcher og parallelt, med en
+TTL-basert cache slik at noen tusen adresser sjekkes på sekunder. Leads med
+døde e-postdomener nedprioriteres (trekk i potentialScore).
+
+Bruker dnspython hvis installert; ellers faller vi tilbake til A/AAAA-oppslag
+via socket (implisitt MX, RFC 5321). For lokal kjøring uten nett kan en
+StubResolver sendes inn. Med aktiv kassett (se cassette.py) tas svarene opp
+og spilles av, så en avspilt kjøring ikke gjør DNS-oppslag.
+
+Kjør (beriker public/leads-brreg.json på stedet):
+    python email_enrichment.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cassette
+from lazy_imports import available
+
+# dnspython importeres først ved første oppslag (se lazy_imports)
+HAS_DNSPYTHON = available("dns")
+
+MX_WORKERS = 32
+MX_BATCH_SIZE = 256
+MX_TIMEOUT = 3.0
+
+# TTL for cache (sekunder) – DNS-TTL brukes når den finnes, innenfor disse grensene
+MIN_CACHE_TTL = 300
+MAX_CACHE_TTL = 24 * 3600
+NEGATIVE_CACHE_TTL = 900
+
+# Trekk i score for leads der e-postdomenet ikke tar imot e-post
+DEAD_DOMAIN_PENALTY = 20
+
+# Status for e-postdomenet lagres på leadet (emailStatus), slik at trekket bare
+# gjøres når statusen endres og ikke på nytt hver gang en fil berikes
+EMAIL_OK = "ok"
+EMAIL_DEAD = "dead"
+EMAIL_UNKNOWN = "unknown"
+
+EMAIL_RE = re.compile(
+    r"^[a-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@([a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$"
+)
+
+
+def normalize_email(raw) -> str:
+    """Normaliser en e-postadresse (trim, fjern mailto:, små bokstaver, IDNA-domene)."""
+    if not isinstance(raw, str):
+        return ""
+    value = raw.strip().strip("<>").strip()
+    if value.lower().startswith("mailto:"):
+        value = value[7:]
+    value = value.split("?", 1)[0].strip().rstrip(".")
+    if value.count("@") != 1:
+        return ""
+    local, domain = value.split("@")
+    domain = domain.strip().rstrip(".").lower()
+    try:
+        domain = domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        return ""
+    return f"{local.strip().lower()}@{domain}"
+
+
+def is_valid_email(email: str) -> bool:
+    """Syntaktisk validering av en normalisert e-postadresse."""
+    if not email or len(email) > 254:
+        return False
+    local = email.split("@", 1)[0]
+    if len(local) > 64:
+        return False
+    return EMAIL_RE.match(email) is not None
+
+
+def email_domain(email: str) -> str:
+    return email.rsplit("@", 1)[-1] if "@" in email else ""
+
+
+class DnsCache:
+    """Trådsikker TTL-cache for MX-resultater per domene."""
+
+    def __init__(self):
+        self._entries: dict[str, tuple[float, bool | None]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, domain: str):
+        """Returnerer (treff, verdi). Utløpte oppføringer regnes som bom."""
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[domain]
+                return False, None
+            return True, value
+
+    def put(self, domain: str, value: bool | None, ttl: float):
+        with self._lock:
+            self._entries[domain] = (time.monotonic() + ttl, value)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class StubResolver:
+    """Lokal resolver for kjøring uten nett: domene -> True/False/None."""
+
+    def __init__(self, answers: dict[str, bool | None] | None = None, default: bool | None = True):
+        self.answers = {k.lower(): v for k, v in (answers or {}).items()}
+        self.default = default
+        self.calls = 0
+
+    def __call__(self, domain: str) -> tuple[bool | None, float]:
+        self.calls += 1
+        return self.answers.get(domain, self.default), MIN_CACHE_TTL
+
+
+def _clamp_ttl(ttl: float) -> float:
+    return max(MIN_CACHE_TTL, min(ttl, MAX_CACHE_TTL))
+
+
+def _resolve_dnspython(domain: str) -> tuple[bool | None, float]:
+    import dns.exception
+    import dns.resolver
+
+    resolver = dns.resolver.Resolver()
+    resolver.lifetime = MX_TIMEOUT
+    try:
+        answer = resolver.resolve(domain, "MX")
+        hosts = [r for r in answer if str(r.exchange) not in (".", "")]
+        return bool(hosts), _clamp_ttl(answer.rrset.ttl)
+    except dns.resolver.NXDOMAIN:
+        return False, NEGATIVE_CACHE_TTL
+    except dns.resolver.NoAnswer:
+        # Ingen MX – implisitt MX hvis domenet har A/AAAA
+        return _resolve_socket(domain)
+    except dns.exception.DNSException:
+        # Inkl. NoNameservers (SERVFAIL/alle resolvere feilet) og timeout –
+        # forbigående, så domenet regnes som ukjent og ikke som dødt
+        return None, NEGATIVE_CACHE_TTL
+
+
+def _resolve_socket(domain: str) -> tuple[bool | None, float]:
+    try:
+        socket.getaddrinfo(domain, 25, proto=socket.IPPROTO_TCP)
+        return True, MIN_CACHE_TTL
+    except socket.gaierror as e:
+        if e.errno in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)):
+            return False, NEGATIVE_CACHE_TTL
+        return None, NEGATIVE_CACHE_TTL
+    except (OSError, UnicodeError):
+        return None, NEGATIVE_CACHE_TTL
+
+
+def _live_resolver(domain: str) -> tuple[bool | None, float]:
+    if HAS_DNSPYTHON:
+        return _resolve_dnspython(domain)
+    return _resolve_socket(domain)
+
+
+def default_resolver(domain: str) -> tuple[bool | None, float]:
+    """Slå opp om domenet tar imot e-post. Returnerer (resultat, ttl)."""
+    value, ttl = cassette.call("mx", domain, lambda: list(_live_resolver(domain)))
+    return value, ttl
+
+
+_cache = DnsCache()
+
+
+def check_mx_domains(domains, resolver=None, cache: DnsCache | None = None,
+                     max_workers: int = MX_WORKERS) -> dict[str, bool | None]:
+    """
+    Sjekk MX for en samling domener, i batcher og parallelt.
+    Returnerer domene -> True (tar imot e-post), False (dødt) eller None (ukjent).
+    """
+    resolver = resolver or default_resolver
+    cache = cache if cache is not None else _cache
+    results: dict[str, bool | None] = {}
+    pending = []
+    for domain in dict.fromkeys(d for d in domains if d):
+        hit, value = cache.get(domain)
+        if hit:
+            results[domain] = value
+        else:
+            pending.append(domain)
+
+    if not pending:
+        return results
+
+    def lookup(domain: str):
+        try:
+            value, ttl = resolver(domain)
+        except Exception:
+            value, ttl = None, NEGATIVE_CACHE_TTL
+        cache.put(domain, value, ttl)
+        return domain, value
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+        for start in range(0, len(pending), MX_BATCH_SIZE):
+            batch = pending[start:start + MX_BATCH_SIZE]
+            for domain, value in pool.map(lookup, batch):
+                results[domain] = value
+
+    return results
+
+
+def lead_email(lead: dict) -> str:
+    """Finn e-postadressen til et lead (Brreg legger den i notes)."""
+    for key in ("epost", "notes"):
+        value = lead.get(key) or ""
+        if "@" in value:
+            return value
+    return ""
+
+
+def enrich_leads(leads: list[dict], resolver=None, cache: DnsCache | None = None) -> dict[str, int]:
+    """
+    Normaliser og valider e-post på leads, og nedprioriter leads med døde
+    e-postdomener. Endrer leads på stedet og returnerer statistikk.
+
+    Idempotent: trekket gjøres bare når emailStatus går over til "dead", og
+    gis tilbake hvis domenet senere tar imot e-post. Ukjent svar (SERVFAIL,
+    timeout) endrer ikke en tidligere status.
+    """
+    stats = {"med_epost": 0, "ugyldig": 0, "ok": 0, "dodt_domene": 0, "ukjent": 0}
+    candidates = []
+    for lead in leads:
+        raw = lead_email(lead)
+        if not raw:
+            continue
+        stats["med_epost"] += 1
+        email = normalize_email(raw)
+        if not is_valid_email(email):
+            stats["ugyldig"] += 1
+            continue
+        if lead.get("notes") == raw:
+            lead["notes"] = email
+        candidates.append((lead, email))
+
+    start = time.monotonic()
+    verdicts = check_mx_domains((email_domain(e) for _, e in candidates), resolver, cache)
+
+    for lead, email in candidates:
+        verdict = verdicts.get(email_domain(email))
+        previous = lead.get("emailStatus")
+        if verdict is True:
+            stats["ok"] += 1
+            if previous == EMAIL_DEAD:
+                lead["potentialScore"] = lead.get("potentialScore", 0) + DEAD_DOMAIN_PENALTY
+            lead["emailStatus"] = EMAIL_OK
+        elif verdict is False:
+            stats["dodt_domene"] += 1
+            if previous != EMAIL_DEAD:
+                lead["potentialScore"] = max(0, lead.get("potentialScore", 0) - DEAD_DOMAIN_PENALTY)
+            lead["emailStatus"] = EMAIL_DEAD
+        else:
+            stats["ukjent"] += 1
+            lead.setdefault("emailStatus", EMAIL_UNKNOWN)
+
+    print(
+        f"  E-post: {stats['med_epost']} med e-post, {stats['ugyldig']} ugyldige, "
+        f"{stats['ok']} OK, {stats['dodt_domene']} døde domener, {stats['ukjent']} ukjente "
+        f"({len(verdicts)} domener på {time.monotonic() - start:.1f}s)"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valider e-post og sjekk MX for leads (endrer filen på stedet).")
+    parser.add_argument("path", nargs="?", default=os.path.join(os.path.dirname(__file__), "public", "leads-brreg.json"),
+                        help="Leads-fil (standard public/leads-brreg.json)")
+    path = parser.parse_args().path
+    print(f"=== E-postberiking ({path}) ===\n")
+    with open(path, "r", encoding="utf-8") as f:
+        leads = json.load(f)
+    enrich_leads(leads)
+    leads.sort(key=lambda l: -l["potentialScore"])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(leads, f, ensure_ascii=False, indent=2)
+    print(f"\nSkrev {len(leads)} leads til {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Geofence-filtrering av Places-treff mot kommunegrenser.
+
+locationBias i Places-søket vokser til 50 km og gir treff i Oslo, Drammen
+osv. Geofencen sjekker punktet (places.location) mot lokale kommunegrenser
+(GeoJSON) slik at treff utenfor området forkastes rett etter søket, før
+Gemini-kall og nettsideverifisering.
+
+Oppslag går via en forhåndsberegnet rutenett-indeks: hver celle kjenner
+kommunene hvis bounding box overlapper den, og cellene som ligger helt inne
+i én kommune svarer direkte uten punkt-i-polygon-test.
+
+Grensene ligger i geo/kommuner.geojson (FeatureCollection med
+properties.kommunenummer). Mangler filen, er geofencen av.
+
+Last ned grenser for regionsettet fra Kartverket:
+    python geofence.py --download
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+
+import regions
+
+GEOFENCE_FILE = os.getenv(
+    "GEOFENCE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "geo", "kommuner.geojson")
+)
+
+# Cellestørrelse i grader (ca. 2,8 km nord-sør)
+CELL_SIZE = 0.025
+
+# Slingringsmonn når en kant treffer en cellegrense nøyaktig (flyttall)
+_EDGE_EPSILON = 1e-9
+
+
+def _point_in_ring(lon: float, lat: float, ring: list) -> bool:
+    """Ray casting mot én ring ([[lon, lat], ...])."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _point_in_polygons(lon: float, lat: float, polygons: list) -> bool:
+    """Polygoner på GeoJSON-form: [[ytre ring, hull, ...], ...]."""
+    for polygon in polygons:
+        if polygon and _point_in_ring(lon, lat, polygon[0]):
+            if not any(_point_in_ring(lon, lat, hole) for hole in polygon[1:]):
+                return True
+    return False
+
+
+def _polygons(geometry: dict) -> list:
+    if geometry.get("type") == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry.get("type") == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+class Geofence:
+    """Kommunegrenser med rutenett-indeks for raske punkt-i-polygon-oppslag."""
+
+    def __init__(self, areas: dict[str, list], cell_size: float = CELL_SIZE):
+        self.areas = areas
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[str]] = {}
+        self.full_cells: dict[tuple[int, int], str] = {}
+        self._build_index()
+
+    def _cell(self, lon: float, lat: float) -> tuple[int, int]:
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def _segment_cells(self, x0: float, y0: float, x1: float, y1: float):
+        """Alle celler en kant går gjennom, kolonne for kolonne (ikke bare endepunktene)."""
+        size = self.cell_size
+        if x0 > x1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        first = math.floor((x0 - _EDGE_EPSILON) / size)
+        last = math.floor((x1 + _EDGE_EPSILON) / size)
+        for cx in range(first, last + 1):
+            if x1 == x0:
+                ya, yb = y0, y1
+            else:
+                # Kantens y ved kolonnens venstre og høyre grense (klippet til kanten)
+                xa = max(x0, cx * size)
+                xb = min(x1, (cx + 1) * size)
+                slope = (y1 - y0) / (x1 - x0)
+                ya, yb = y0 + (xa - x0) * slope, y0 + (xb - x0) * slope
+            low, high = min(ya, yb), max(ya, yb)
+            for cy in range(math.floor((low - _EDGE_EPSILON) / size), math.floor((high + _EDGE_EPSILON) / size) + 1):
+                yield cx, cy
+
+    def _build_index(self):
+        boundary_cells = set()
+        for nr, polygons in self.areas.items():
+            points = [pt for polygon in polygons for pt in polygon[0]]
+            if not points:
+                continue
+            min_x, min_y = self._cell(min(p[0] for p in points), min(p[1] for p in points))
+            max_x, max_y = self._cell(max(p[0] for p in points), max(p[1] for p in points))
+            for cx in range(min_x, max_x + 1):
+                for cy in range(min_y, max_y + 1):
+                    self.cells.setdefault((cx, cy), []).append(nr)
+            for polygon in polygons:
+                for ring in polygon:
+                    for a, b in zip(ring, ring[1:] + ring[:1]):
+                        boundary_cells.update(self._segment_cells(a[0], a[1], b[0], b[1]))
+
+        # Celler som ingen grensekant krysser, og med én kandidat, ligger helt
+        # innenfor eller helt utenfor; sentrum avgjør hvilket
+        for cell, candidates in self.cells.items():
+            if len(candidates) != 1 or cell in boundary_cells:
+                continue
+            nr = candidates[0]
+            cx = (cell[0] + 0.5) * self.cell_size
+            cy = (cell[1] + 0.5) * self.cell_size
+            if _point_in_polygons(cx, cy, self.areas[nr]):
+                self.full_cells[cell] = nr
+
+    def locate(self, lat: float, lon: float) -> str | None:
+        """Kommunenummeret punktet ligger i, eller None hvis utenfor alle."""
+        cell = self._cell(lon, lat)
+        if cell in self.full_cells:
+            return self.full_cells[cell]
+        for nr in self.cells.get(cell, ()):
+            if _point_in_polygons(lon, lat, self.areas[nr]):
+                return nr
+        return None
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return self.locate(lat, lon) is not None
+
+
+def load_geofence(kommuner: dict[str, str] | None = None, path: str | None = None) -> Geofence | None:
+    """Last grenser for gitte kommuner (kommunenummer -> navn). None hvis filen mangler."""
+    path = path or GEOFENCE_FILE
+    if not os.path.exists(path):
+        print(f"  Geofence: fant ikke {path} – ingen geografisk filtrering")
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        collection = json.load(f)
+
+    areas = {}
+    for feature in collection.get("features", []):
+        nr = str((feature.get("properties") or {}).get("kommunenummer", "")).zfill(4)
+        if kommuner is not None and nr not in kommuner:
+            continue
+        areas.setdefault(nr, []).extend(_polygons(feature.get("geometry") or {}))
+
+    if not areas:
+        print(f"  Geofence: ingen av kommunene finnes i {path} – ingen geografisk filtrering")
+        return None
+    return Geofence(areas)
+
+
+def download_boundaries(kommuner: dict[str, str], path: str | None = None):
+    """Hent kommunegrenser (WGS84) fra Kartverkets kommuneinfo-API og skriv GeoJSON."""
+    from http_client import get_client
+
+    client = get_client("geonorge")
+    features = []
+    for nr, navn in kommuner.items():
+        resp = client.get(f"{regions.GEONORGE_URL}/{nr}/omrade", params={"utkoordsys": 4326})
+        if resp.status_code != 200:
+            print(f"  Kunne ikke hente grense for {nr} {navn}: {resp.status_code}")
+            continue
+        features.append({
+            "type": "Feature",
+            "properties": {"kommunenummer": nr, "navn": navn},
+            "geometry": resp.json().get("omrade"),
+        })
+
+    path = path or GEOFENCE_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, ensure_ascii=False)
+    print(f"Skrev {len(features)} kommunegrenser til {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kommunegrenser for geofence-filtrering.")
+    parser.add_argument("--download", action="store_true", help="Last ned grenser fra Kartverket")
+    parser.add_argument("--set", dest="region_set", help="Regionsett fra regions.json")
+    args = parser.parse_args()
+
+    kommuner = regions.kommuner(regions.load_regions(args.region_set))
+    if args.download:
+        download_boundaries(kommuner)
+        return
+
+    fence = load_geofence(kommuner)
+    if fence:
+        print(f"{len(fence.areas)} kommuner, {len(fence.cells)} celler ({len(fence.full_cells)} helt innenfor)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Felles, robust HTTP-klientlag for alle eksterne API-er (Places, Gemini, Brreg,
+domeneprober og Geonorge).
+
+Hvert API får sin egen klient med:
+  - delt requests.Session med tilkoblingspool (keep-alive)
+  - tak på samtidige forespørsler og token-bucket-ratebegrensning
+  - standard timeout
+  - eksponentiell backoff med jitter som respekterer Retry-After
+  - circuit breaker som stopper kall mot et API som feiler gjentatte ganger
+  - tidsfrist (--deadline): timeout og ventetid før nye forsøk kuttes til
+    gjenværende tid, og det gis opp når neste forsøk ikke rekker fristen
+
+Klientene returnerer siste respons (også ved feilstatus), slik at kallerne
+beholder sin egen håndtering av statuskoder.
+
+Bruk:
+    from http_client import get_client
+    resp = get_client("places").post(url, json=body, headers=headers)
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING
+
+import budget
+import cassette
+import deadline
+from lazy_imports import request_error
+
+if TYPE_CHECKING:
+    import requests
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Innstillinger per API. rate = forespørsler per sekund, burst = bøttestørrelse,
+# breaker_threshold = påfølgende feil før kretsen åpnes (None = av).
+API_SETTINGS = {
+    "places": {"rate": 8.0, "burst": 10, "concurrency": 4, "timeout": 20, "retries": 4, "breaker_threshold": 5},
+    "gemini": {"rate": 1.0, "burst": 2, "concurrency": 2, "timeout": 30, "retries": 4, "breaker_threshold": 5},
+    "brreg": {"rate": 5.0, "burst": 5, "concurrency": 4, "timeout": 20, "retries": 4, "breaker_threshold": 5},
+    # Domenegjetting går mot vilkårlige verter – feil er forventet, så ingen retry/breaker
+    "web": {"rate": 10.0, "burst": 10, "concurrency": 16, "timeout": 5, "retries": 0, "breaker_threshold": None},
+    "geonorge": {"rate": 5.0, "burst": 5, "concurrency": 4, "timeout": 30, "retries": 3, "breaker_threshold": 5},
+}
+
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+BREAKER_RESET = 60.0
+
+# Minste timeout per forsøk når tidsfristen nesten er nådd (sekunder)
+DEADLINE_MIN_TIMEOUT = 2.0
+
+
+def _circuit_open_error() -> type:
+    return request_error(__name__, "CircuitOpenError", "Kastes når kretsen for et API er åpen og kall avvises umiddelbart.")
+
+
+def __getattr__(name: str):
+    # requests importeres først ved første kall (se lazy_imports), også unntakstypene
+    if name == "CircuitOpenError":
+        return _circuit_open_error()
+    if name == "RequestException":
+        import requests
+
+        return requests.RequestException
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class TokenBucket:
+    """Token-bucket-ratebegrensning: rate tokens per sekund, maks capacity."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Tøm bøtta slik at ingen nye kall slipper gjennom før om `seconds`."""
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+            self.updated = time.monotonic()
+
+
+class CircuitBreaker:
+    """Enkel circuit breaker: lukket -> åpen etter N feil -> halvåpen etter reset."""
+
+    def __init__(self, threshold: int | None, reset_timeout: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.threshold is None:
+            return True
+        with self.lock:
+            if self.failures < self.threshold:
+                return True
+            # Halvåpen: slipp gjennom ett prøvekall etter reset_timeout
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_failure(self):
+        if self.threshold is None:
+            return
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+def parse_retry_after(value) -> float | None:
+    """Tolk Retry-After (sekunder eller HTTP-dato) til antall sekunder."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Eksponentiell backoff med full jitter."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class ApiClient:
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int,
+                 timeout: float, retries: int, breaker_threshold: int | None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.breaker = CircuitBreaker(breaker_threshold)
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        # Avspilling svarer lokalt uten ratebegrensning eller nettverk
+        if cassette.is_replaying():
+            resp = cassette.replay_http(self.name, method, url, kwargs)
+        else:
+            resp = self._send(method, url, **kwargs)
+            cassette.record_http(self.name, method, url, kwargs, resp)
+        budget.current().record_http(self.name, kwargs, resp)
+        return resp
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        import requests
+
+        run_deadline = deadline.current()
+        kwargs.setdefault("timeout", self.timeout)
+        timeout = kwargs["timeout"]
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise _circuit_open_error()(f"{self.name}: kretsen er åpen etter gjentatte feil")
+
+            if run_deadline.enabled and isinstance(timeout, (int, float)):
+                # Ett forsøk skal ikke blokkere langt forbi fristen
+                kwargs["timeout"] = max(DEADLINE_MIN_TIMEOUT, min(timeout, run_deadline.remaining()))
+
+            self.bucket.acquire()
+            try:
+                with self.semaphore:
+                    resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt)
+                if attempt >= self.retries or not self._retry_fits(run_deadline, delay):
+                    raise
+                print(f"    {self.name}: tilkoblingsfeil, prøver igjen om {delay:.1f}s (forsøk {attempt + 1}/{self.retries})")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if resp.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                return resp
+
+            # 429 betyr at API-et lever, men struper oss – det håndteres av bøtta
+            # under, og skal ikke åpne kretsen (kun 5xx og tilkoblingsfeil teller)
+            if resp.status_code != 429:
+                self.breaker.record_failure()
+
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            delay = min(retry_after, BACKOFF_CAP * 4) if retry_after is not None else backoff_delay(attempt)
+            if attempt >= self.retries or not self._retry_fits(run_deadline, delay):
+                return resp
+            print(f"    {self.name}: HTTP {resp.status_code}, venter {delay:.1f}s (forsøk {attempt + 1}/{self.retries})")
+            if resp.status_code == 429:
+                # Rate limit gjelder hele API-et – bremser alle tråder via bøtta, ikke bare denne
+                self.bucket.pause(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+    def _retry_fits(self, run_deadline: deadline.Deadline, delay: float) -> bool:
+        """Om et nytt forsøk etter delay sekunder rekkes før tidsfristen (alltid uten frist)."""
+        if run_deadline.remaining() > delay + DEADLINE_MIN_TIMEOUT:
+            return True
+        print(f"    {self.name}: gir opp nye forsøk – tidsfristen nås før neste forsøk")
+        return False
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+
+_clients: dict[str, ApiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str) -> ApiClient:
+    """Hent (og opprett ved behov) den delte klienten for et API."""
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = ApiClient(name, **API_SETTINGS[name])
+            _clients[name] = client
+        return client
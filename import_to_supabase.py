@@ -8,34 +8,61 @@ hoppes over og legges ikke til på nytt.
 Kjør:
     1. python leads.py               # Henter nye leads (Asker + Bærum)
     2. python import_to_supabase.py  # Legger kun til nye i Supabase
+
+    python import_to_supabase.py --profile   # minne/tid per steg til public/import.profile.json
 """
 
+import argparse
 import json
 import os
-from supabase import create_client, Client
+import sys
+
 from dotenv import load_dotenv
 
+import cassette
+import profiling
+from lazy_imports import create_client
+
 load_dotenv()
 
 # Hent Supabase-credentials fra .env
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-    print("❌ Feil: SUPABASE_URL og SUPABASE_SERVICE_ROLE_KEY må være satt i .env")
-    exit(1)
+# Klienten opprettes først ved første bruk (se get_supabase)
+supabase = None
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# Kolonner i leads-tabellen – andre felter i JSON (f.eks. koordinater) sendes ikke
+DB_COLUMNS = {
+    "id", "name", "address", "rating", "user_rating_count", "industry", "phone", "email",
+    "has_website", "potential_score", "info", "source", "status", "notes",
+}
 
 # Status som betyr at leadet ikke skal legges til igjen
 FINAL_STATUSES = {"accepted", "rejected"}  # godtatt, avslått
 
 
+def get_supabase():
+    """Opprett Supabase-klienten ved første bruk. Avslutter hvis den ikke er konfigurert."""
+    global supabase
+    configured = bool(SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY and create_client)
+    if supabase is None and not cassette.available("supabase", "leads.select(id, status)", configured):
+        print("❌ Feil: SUPABASE_URL og SUPABASE_SERVICE_ROLE_KEY må være satt i .env")
+        sys.exit(1)
+    if supabase is None and not cassette.is_replaying():
+        supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    return supabase
+
+
 def get_existing_leads() -> dict[str, str]:
     """Henter alle eksisterende lead-ider og deres status fra Supabase."""
     print("📥 Henter eksisterende leads fra Supabase...")
-    result = supabase.table("leads").select("id, status").execute()
-    return {row["id"]: (row.get("status") or "pending") for row in (result.data or [])}
+    client = get_supabase()
+    rows = cassette.call(
+        "supabase", "leads.select(id, status)",
+        lambda: client.table("leads").select("id, status").execute().data or [],
+    )
+    return {row["id"]: (row.get("status") or "pending") for row in rows}
 
 
 def import_leads(json_file: str, existing: dict[str, str]) -> dict[str, str]:
@@ -91,13 +118,19 @@ def import_leads(json_file: str, existing: dict[str, str]) -> dict[str, str]:
             lead["potential_score"] = lead.pop("potentialScore")
         if "source" not in lead:
             lead["source"] = "google_places"
+        for field in set(lead) - DB_COLUMNS:
+            del lead[field]
     
     print(f"📤 Legger til {len(to_insert)} nye leads...")
     
+    client = get_supabase()
     batch_size = 100
     for i in range(0, len(to_insert), batch_size):
         batch = to_insert[i:i + batch_size]
-        supabase.table("leads").insert(batch).execute()
+        cassette.call(
+            "supabase", ["leads.insert", [l["id"] for l in batch]],
+            lambda: len(client.table("leads").insert(batch).execute().data or []),
+        )
         for lead in batch:
             existing[lead["id"]] = lead.get("status", "pending")
         print(f"   ✓ La til {len(batch)} leads (batch {i // batch_size + 1})")
@@ -105,15 +138,30 @@ def import_leads(json_file: str, existing: dict[str, str]) -> dict[str, str]:
     print(f"✅ Ferdig! {len(to_insert)} nye leads lagt til fra {json_file}")
     return existing
 
-if __name__ == "__main__":
+
+def main():
+    parser = argparse.ArgumentParser(description="Importer nye leads fra public/*.json til Supabase.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mål minne og tid per steg (rapport i public/import.profile.json)")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable("public/import.json")
+
     print("🚀 Starter import til Supabase...")
     print("   (Kun nye leads legges til. Godtatt/avslått overskrives ikke.)\n")
     
-    existing = get_existing_leads()
+    with profiling.stage("eksisterende"):
+        existing = get_existing_leads()
     print(f"   {len(existing)} leads finnes allerede i databasen\n")
     
-    existing = import_leads("public/leads.json", existing)
-    existing = import_leads("public/leads-brreg.json", existing)
+    with profiling.stage("leads.json"):
+        existing = import_leads("public/leads.json", existing)
+    with profiling.stage("leads-brreg.json"):
+        existing = import_leads("public/leads-brreg.json", existing)
 
     print("\n🎉 Import fullført!")
     print(f"   Totalt {len(existing)} leads i databasen nå.")
+
+
+if __name__ == "__main__":
+    main()
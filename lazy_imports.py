@@ -0,0 +1,55 @@
+"""
+Late importer av tunge valgfrie avhengigheter.
+
+supabase (med httpx, pydantic m.m.), googlesearch, requests og dnspython tar
+merkbar tid å importere. Modulene sjekker bare om pakken finnes ved oppstart,
+og selve importen skjer først når klienten/søket/kallet faktisk brukes. Da
+blir --help, tørrkjøringer og små shard-jobber raske.
+
+Unntakstyper som arver requests.RequestException (f.eks.
+http_client.CircuitOpenError) lages med request_error() og hentes via
+modul-__getattr__ (PEP 562), så `except http_client.RequestException` ikke
+krever requests før et unntak faktisk fanges.
+"""
+
+import threading
+from importlib.util import find_spec
+
+
+def available(name: str) -> bool:
+    try:
+        return find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _create_client(url: str, key: str):
+    from supabase import create_client
+
+    return create_client(url, key)
+
+
+def _google_search(*args, **kwargs):
+    from googlesearch import search
+
+    return search(*args, **kwargs)
+
+
+_request_errors: dict[str, type] = {}
+_request_errors_lock = threading.Lock()
+
+
+def request_error(module: str, name: str, doc: str) -> type:
+    """Unntaksklassen module.name som arver requests.RequestException (lages én gang)."""
+    with _request_errors_lock:
+        key = f"{module}.{name}"
+        if key not in _request_errors:
+            import requests
+
+            _request_errors[key] = type(name, (requests.RequestException,), {"__module__": module, "__doc__": doc})
+        return _request_errors[key]
+
+
+# Samme form som `try: from x import y except ImportError: y = None`
+create_client = _create_client if available("supabase") else None
+google_search = _google_search if available("googlesearch") else None
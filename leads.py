@@ -4,26 +4,37 @@ Hent leads fra Google Places API (bedrifter uten nettside i Asker og Bærum),
 verifiser via Google-søk, og skriv resultater til public/leads.json.
 
 Svartelisting: Henter eksisterende lead-IDer fra Supabase og ekskluderer dem.
+
+Kjør:
+    python leads.py
+    python leads.py --deadline 10    # stopp etter 10 min, skriv og importer det som er ferdig
+    python leads.py --profile        # minne/tid per steg til public/leads.profile.json
 """
 
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
 import json
 import os
 import re
 import time
 from urllib.parse import urlparse
 
-import requests
 from dotenv import load_dotenv
 
-try:
-    from supabase import create_client
-except ImportError:
-    create_client = None
-
-try:
-    from googlesearch import search as google_search
-except ImportError:
-    google_search = None
+import archive
+import brreg
+import budget
+import cassette
+import deadline
+import geofence
+import profiling
+import regions
+import http_client
+from http_client import TokenBucket, get_client
+from lazy_imports import create_client, google_search
 
 load_dotenv()
 
@@ -35,11 +46,12 @@ GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini
 
 API_URL = "https://places.googleapis.com/v1/places:searchText"
 
-# Lokasjoner
-LOCATIONS = {
-    "ASKER": {"latitude": 59.9130155, "longitude": 10.5583176},
-    "BÆRUM": {"latitude": 59.9186, "longitude": 10.5003},
-}
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "public", "leads.json")
+
+# Lokasjoner (fra regionsettet i regions.json, se REGION_SET)
+_REGIONS = regions.load_regions()
+LOCATIONS = regions.locations(_REGIONS)  # kommunenummer -> senterpunkt
+KOMMUNE_NAVN = regions.kommuner(_REGIONS)  # kommunenummer -> navn (sted)
 
 INITIAL_RADIUS = 5000
 MAX_RESULTS_PER_QUERY = 20
@@ -49,6 +61,14 @@ MAX_PAGES = 10
 MAX_RADIUS = 50000
 RADIUS_GROWTH = 2
 
+PLACES_FIELD_MASK = (
+    "places.displayName,places.formattedAddress,"
+    "places.rating,places.userRatingCount,places.types,"
+    "places.nationalPhoneNumber,places.websiteUri,places.id,"
+    "places.editorialSummary,places.reviews,places.primaryTypeDisplayName,"
+    "places.location"
+)
+
 SEARCH_QUERIES = [
     "frisor", "regnskapsforer", "bilverksted", "bilpleie",
     "rørlegger", "elektriker", "snekker", "tømrer",
@@ -81,6 +101,12 @@ INDUSTRY_MAP = {
     "house_cleaning": "Renhold",
 }
 
+# Google-søk går ikke via http_client; egen bøtte holder baseline-tempoet
+# (ett søk per 1,5 s) også når flere tråder verifiserer (se reverify.py)
+SEARCH_INTERVAL = 1.5
+SEARCH_BLOCKED_PAUSE = 60
+_search_bucket = TokenBucket(1 / SEARCH_INTERVAL, 1)
+
 CATALOG_DOMAINS = {
     "gulesider.no", "proff.no", "1881.no", "facebook.com",
     "instagram.com", "linkedin.com", "twitter.com", "x.com",
@@ -90,17 +116,47 @@ CATALOG_DOMAINS = {
 }
 
 
-def get_blacklisted_ids() -> set[str]:
+_geofence = None
+_geofence_loaded = False
+
+
+def use_regions(region_list: list[dict]):
+    """Bytt regionsett ved kjøretid (f.eks. shards.py --set); geofencen lastes på nytt."""
+    global _REGIONS, LOCATIONS, KOMMUNE_NAVN, _geofence_loaded
+    _REGIONS = region_list
+    LOCATIONS = regions.locations(region_list)
+    KOMMUNE_NAVN = regions.kommuner(region_list)
+    _geofence_loaded = False
+
+
+def use_geofence(kommuner: dict[str, str]):
+    """Bytt geofence til gitte kommuner (kommunenummer -> navn), f.eks. per shard."""
+    global _geofence, _geofence_loaded
+    _geofence = geofence.load_geofence(kommuner)
+    _geofence_loaded = True
+
+
+def get_geofence():
+    """Geofence for regionsettet, lastet ved første bruk (None hvis grenser mangler)."""
+    if not _geofence_loaded:
+        use_geofence(KOMMUNE_NAVN)
+    return _geofence
+
+
+def get_blacklisted_ids(client=None) -> set[str]:
     """Hent alle eksisterende lead-IDer fra Supabase for svartelisting."""
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key or not create_client:
+    configured = bool(url and key and create_client)
+    if client is None and not cassette.available("supabase", "leads.select(id)", configured):
         print("  Supabase ikke konfigurert – ingen svartelisting")
         return set()
     try:
-        client = create_client(url, key)
-        result = client.table("leads").select("id").execute()
-        ids = {row["id"] for row in (result.data or [])}
+        def fetch():
+            result = (client or create_client(url, key)).table("leads").select("id").execute()
+            return result.data or []
+
+        ids = {row["id"] for row in cassette.call("supabase", "leads.select(id)", fetch)}
         print(f"  Svarteliste: {len(ids)} eksisterende leads i Supabase")
         return ids
     except Exception as e:
@@ -108,9 +164,51 @@ def get_blacklisted_ids() -> set[str]:
         return set()
 
 
+def info_context(place: dict) -> dict:
+    """
+    Kompakt utdrag av et Places-treff med det generate_info_text trenger.
+    Lagres på leadet slik at beskrivelsen kan genereres senere, kun for leads
+    som faktisk havner i resultatet (se fill_info).
+    """
+    context = {
+        key: place[key]
+        for key in ("displayName", "formattedAddress", "primaryTypeDisplayName",
+                    "editorialSummary", "rating", "userRatingCount")
+        if key in place
+    }
+    reviews = []
+    for review in place.get("reviews") or []:
+        text = (review.get("text") or {}).get("text", "")
+        if len(text) > 20:
+            reviews.append({"text": {"text": text[:300]}})
+        if len(reviews) >= 5:
+            break
+    if reviews:
+        context["reviews"] = reviews
+    return context
+
+
+def fill_info(leads: list[dict]) -> list[dict]:
+    """Generer info-tekst for leads som fortsatt mangler den (lat evaluering)."""
+    pending = sorted((lead for lead in leads if "_place" in lead), key=lambda l: -l["potentialScore"])
+    if pending:
+        print(f"\nGenererer beskrivelser for {len(pending)} leads...")
+    # Høyest score først; når tidsfristen nærmer seg brukes malen for resten
+    run_deadline = deadline.current()
+    for lead in pending:
+        place = lead.pop("_place")
+        if not run_deadline.affords("info"):
+            lead["info"] = _generate_info_template(place, lead["industry"])
+            continue
+        start = time.monotonic()
+        lead["info"] = generate_info_text(place, lead["industry"])
+        run_deadline.stats.observe_stage("info", time.monotonic() - start)
+    return leads
+
+
 def generate_info_text(place: dict, industry: str) -> str:
     """Generer 2 setninger om bedriften for cold-call-kontekst."""
-    if GEMINI_API_KEY:
+    if (GEMINI_API_KEY or cassette.is_replaying()) and budget.current().allow("gemini"):
         try:
             result = _generate_info_with_gemini(place, industry)
             if result:
@@ -183,32 +281,25 @@ def _generate_info_with_gemini(place: dict, industry: str) -> str:
         f"KONTEKST:\n{context}"
     )
 
-    max_retries = 3
-    delay = 1.0
-    for attempt in range(max_retries + 1):
-        time.sleep(delay)
-        resp = requests.post(
-            GEMINI_API_URL,
-            headers={
-                "Content-Type": "application/json",
-                "x-goog-api-key": GEMINI_API_KEY,
-                "Referer": "http://localhost:5175",
-            },
-            json={
-                "contents": [{"parts": [{"text": prompt}]}],
-            },
-        )
-        if resp.status_code == 429 and attempt < max_retries:
-            delay = min(delay * 2, 16)
-            print(f"    Gemini rate limit, venter {delay}s (forsøk {attempt + 1}/{max_retries})...")
-            continue
-        break
+    # Ratebegrensning og retry (inkl. Retry-After) håndteres av http_client
+    resp = get_client("gemini").post(
+        GEMINI_API_URL,
+        headers={
+            "Content-Type": "application/json",
+            "x-goog-api-key": GEMINI_API_KEY,
+            "Referer": "http://localhost:5175",
+        },
+        json={
+            "contents": [{"parts": [{"text": prompt}]}],
+        },
+    )
 
     if resp.status_code != 200:
         print(f"    Gemini API error {resp.status_code}: {resp.text[:200]}")
         return ""
 
     data = resp.json()
+    budget.current().record_gemini_usage(data)
     text = (
         data.get("candidates", [{}])[0]
         .get("content", {})
@@ -282,90 +373,164 @@ def is_valid_website(value) -> bool:
         return False
 
 
-def fetch_places(sted: str, location: dict, blacklisted_ids: set[str]) -> list[dict]:
-    """Hent bedrifter uten nettside fra Google Places API for en gitt lokasjon."""
-    if not API_KEY:
+def is_candidate_place(p: dict) -> bool:
+    """Billig filter på et rått Places-treff: uten nettside og ikke ekskludert type."""
+    if is_valid_website(p.get("websiteUri")):
+        return False
+    types = p.get("types", [])
+    return bool(types) and not any(t in EXCLUDED_TYPES for t in types)
+
+
+def place_sted(p: dict, sted: str, fence, kommune_navn: dict[str, str]) -> str | None:
+    """Stedet treffet faktisk ligger i ifølge geofencen, eller None hvis utenfor."""
+    point = p.get("location") or {}
+    lat, lng = point.get("latitude"), point.get("longitude")
+    if fence is None or lat is None or lng is None:
+        return sted
+    kommune_nr = fence.locate(lat, lng)
+    if kommune_nr is None:
+        return None
+    return kommune_navn.get(kommune_nr, sted)
+
+
+def place_to_lead(p: dict, place_id: str, sted: str) -> dict:
+    """Map et rått Places-treff til et lead (info genereres senere, se fill_info)."""
+    rating = p.get("rating", 0)
+    review_count = p.get("userRatingCount", 0)
+    has_website = False
+    industry = guess_industry(p.get("types", []))
+    point = p.get("location") or {}
+
+    return {
+        "id": place_id,
+        "name": (p.get("displayName") or {}).get("text", "Unknown"),
+        "address": p.get("formattedAddress", ""),
+        "rating": rating,
+        "userRatingCount": review_count,
+        "industry": industry,
+        "phone": p.get("nationalPhoneNumber", ""),
+        "sted": sted,
+        "hasWebsite": has_website,
+        "potentialScore": calculate_score(rating, review_count, has_website),
+        "info": "",
+        "_place": info_context(p),
+        "latitude": point.get("latitude"),
+        "longitude": point.get("longitude"),
+    }
+
+
+def search_places_page(query: str, sted: str, location: dict, radius: int,
+                       page_token: str | None = None) -> dict | None:
+    """Én side Places Text Search. Returnerer svaret, eller None ved feil."""
+    body = {
+        "textQuery": f"{query} {sted}",
+        "maxResultCount": MAX_RESULTS_PER_QUERY,
+        "locationBias": {
+            "circle": {
+                "center": location,
+                "radius": radius,
+            }
+        },
+    }
+    if page_token:
+        body["pageToken"] = page_token
+
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": API_KEY,
+        "X-Goog-FieldMask": PLACES_FIELD_MASK,
+        "Referer": "http://localhost:5175",
+    }
+
+    try:
+        resp = get_client("places").post(API_URL, json=body, headers=headers)
+    except http_client.RequestException as e:
+        print(f"  API-kall feilet for query '{query}': {e}")
+        return None
+    if resp.status_code != 200:
+        print(f"  API error {resp.status_code} for query '{query}': {resp.text[:200]}")
+        return None
+    return resp.json()
+
+
+def collect_leads(places: list[dict], sted: str, fence, kommune_navn: dict[str, str],
+                  seen_ids: set[str], blacklisted_ids: set[str], id_prefix: str,
+                  verdict_cache: dict[str, bool] | None = None) -> tuple[list[dict], int]:
+    """
+    Nye leads fra én side Places-treff, og antall treff forkastet av geofencen.
+    Treff som verdict_cache (lead-ID -> beholdes) allerede vet har nettside
+    hoppes over, så de ikke tar plasser fra TARGET_RESULTS.
+    """
+    found = []
+    outside = 0
+    for i, p in enumerate(places):
+        if not is_candidate_place(p):
+            continue
+
+        # Geofence: forkast treff utenfor kommunene før dyrere steg
+        lead_sted = place_sted(p, sted, fence, kommune_navn)
+        if lead_sted is None:
+            outside += 1
+            continue
+
+        place_id = p.get("id", f"{id_prefix}-{i}")
+        if place_id in seen_ids or place_id in blacklisted_ids:
+            continue
+        if verdict_cache is not None and verdict_cache.get(place_id) is False:
+            continue
+        seen_ids.add(place_id)
+
+        found.append(place_to_lead(p, place_id, lead_sted))
+    return found, outside
+
+
+def fetch_places(sted: str, location: dict, blacklisted_ids: set[str],
+                 verdict_cache: dict[str, bool] | None = None) -> list[dict]:
+    """
+    Hent bedrifter uten nettside fra Google Places API for en gitt lokasjon.
+    verdict_cache er samme cache som verify_leads bruker (se collect_leads).
+    """
+    if not API_KEY and not cassette.is_replaying():
         print("FEIL: GOOGLE_PLACES_API_KEY ikke funnet i .env")
         return []
 
     results = []
     seen_ids = set()
     radius = INITIAL_RADIUS
+    fence = get_geofence()
+    kommune_navn = KOMMUNE_NAVN
+    outside = 0
 
-    while len(results) < TARGET_RESULTS and radius <= MAX_RADIUS:
+    run_budget = budget.current()
+    stats = deadline.current().stats
+    while len(results) < TARGET_RESULTS and radius <= MAX_RADIUS and run_budget.allow("places"):
         for query in SEARCH_QUERIES:
-            if len(results) >= TARGET_RESULTS:
+            if len(results) >= TARGET_RESULTS or not run_budget.allow("places"):
                 break
 
             next_page_token = None
             page_count = 0
 
-            while len(results) < TARGET_RESULTS and page_count < MAX_PAGES:
-                body = {
-                    "textQuery": f"{query} {sted}",
-                    "maxResultCount": MAX_RESULTS_PER_QUERY,
-                    "locationBias": {
-                        "circle": {
-                            "center": location,
-                            "radius": radius,
-                        }
-                    },
-                }
-                if next_page_token:
-                    body["pageToken"] = next_page_token
-
-                headers = {
-                    "Content-Type": "application/json",
-                    "X-Goog-Api-Key": API_KEY,
-                    "X-Goog-FieldMask": (
-                        "places.displayName,places.formattedAddress,"
-                        "places.rating,places.userRatingCount,places.types,"
-                        "places.nationalPhoneNumber,places.websiteUri,places.id,"
-                        "places.editorialSummary,places.reviews,places.primaryTypeDisplayName"
-                    ),
-                    "Referer": "http://localhost:5175",
-                }
-
-                resp = requests.post(API_URL, json=body, headers=headers)
-                if resp.status_code != 200:
-                    print(f"  API error {resp.status_code} for query '{query}': {resp.text[:200]}")
+            while len(results) < TARGET_RESULTS and page_count < MAX_PAGES and run_budget.allow("places"):
+                start = time.monotonic()
+                data = search_places_page(query, sted, location, radius, next_page_token)
+                if data is None:
                     break
 
-                data = resp.json()
                 places = data.get("places", [])
                 next_page_token = data.get("nextPageToken")
                 page_count += 1
 
-                for i, p in enumerate(places):
-                    if is_valid_website(p.get("websiteUri")):
-                        continue
-                    types = p.get("types", [])
-                    if not types or any(t in EXCLUDED_TYPES for t in types):
-                        continue
-
-                    place_id = p.get("id", f"goog-{radius}-{query}-{page_count}-{i}")
-                    if place_id in seen_ids or place_id in blacklisted_ids:
-                        continue
-                    seen_ids.add(place_id)
-
-                    rating = p.get("rating", 0)
-                    review_count = p.get("userRatingCount", 0)
-                    has_website = False
-                    industry = guess_industry(types)
-
-                    results.append({
-                        "id": place_id,
-                        "name": (p.get("displayName") or {}).get("text", "Unknown"),
-                        "address": p.get("formattedAddress", ""),
-                        "rating": rating,
-                        "userRatingCount": review_count,
-                        "industry": industry,
-                        "phone": p.get("nationalPhoneNumber", ""),
-                        "sted": sted,
-                        "hasWebsite": has_website,
-                        "potentialScore": calculate_score(rating, review_count, has_website),
-                        "info": generate_info_text(p, industry),
-                    })
+                archive.append("places", sted, places, query=query, radius=radius, page=page_count)
+
+                new_leads, dropped = collect_leads(
+                    places, sted, fence, kommune_navn, seen_ids, blacklisted_ids,
+                    f"goog-{radius}-{query}-{page_count}", verdict_cache,
+                )
+                outside += dropped
+                results.extend(new_leads)
+                # Utbyttehistorikk for --deadline (se deadline.py)
+                stats.observe_query(query, len(new_leads), time.monotonic() - start)
 
                 if not next_page_token:
                     break
@@ -373,10 +538,88 @@ def fetch_places(sted: str, location: dict, blacklisted_ids: set[str]) -> list[d
         if len(results) < TARGET_RESULTS:
             radius *= RADIUS_GROWTH
 
+    if outside:
+        print(f"  Forkastet {outside} treff utenfor området (geofence)")
     print(f"  Fant {len(results)} leads for {sted}")
     return results
 
 
+def fetch_places_by_yield(locations: dict[str, dict], blacklisted_ids: set[str],
+                          verdict_cache: dict[str, bool] | None = None) -> list[dict]:
+    """
+    Tidsfrist-variant av fetch_places over alle lokasjoner (kommunenummer ->
+    senterpunkt). Kjører alltid neste side av søket med høyest forventet
+    utbytte per sekund, og stopper når gjenværende tid trengs til å verifisere
+    og beskrive leadene som er funnet.
+    """
+    if not API_KEY and not cassette.is_replaying():
+        print("FEIL: GOOGLE_PLACES_API_KEY ikke funnet i .env")
+        return []
+
+    run_budget = budget.current()
+    run_deadline = deadline.current()
+    fence = get_geofence()
+    kommune_navn = KOMMUNE_NAVN
+    results = []
+    found = dict.fromkeys(locations, 0)
+    seen_ids = set()
+    outside = 0
+
+    # Prioritetskø: (-forventede leads per sekund, rekkefølge, kommune, query, radius, side-token, side)
+    queue = []
+    order = itertools.count()
+
+    def push(kommune_nr: str, query: str, radius: int, page_token: str | None = None, page_count: int = 0):
+        rate = run_deadline.stats.query_rate(query)
+        heapq.heappush(queue, (-rate, next(order), kommune_nr, query, radius, page_token, page_count))
+
+    for query in SEARCH_QUERIES:
+        for kommune_nr in locations:
+            push(kommune_nr, query, INITIAL_RADIUS)
+
+    while queue and run_budget.allow("places"):
+        spare = run_deadline.remaining() - run_deadline.backlog_seconds(len(results))
+        if spare < run_deadline.stats.stage_seconds("places"):
+            print(f"  Tidsfrist: stopper hentingen med {len(results)} leads for å rekke verifisering")
+            break
+
+        _, _, kommune_nr, query, radius, page_token, page_count = heapq.heappop(queue)
+        if found[kommune_nr] >= TARGET_RESULTS:
+            continue
+
+        sted = kommune_navn.get(kommune_nr, kommune_nr)
+        start = time.monotonic()
+        data = search_places_page(query, sted, locations[kommune_nr], radius, page_token)
+        if data is None:
+            continue
+
+        places = data.get("places", [])
+        page_count += 1
+        archive.append("places", sted, places, query=query, radius=radius, page=page_count)
+
+        new_leads, dropped = collect_leads(
+            places, sted, fence, kommune_navn, seen_ids, blacklisted_ids,
+            f"goog-{radius}-{query}-{page_count}", verdict_cache,
+        )
+        outside += dropped
+        found[kommune_nr] += len(new_leads)
+        results.extend(new_leads)
+        run_deadline.stats.observe_query(query, len(new_leads), time.monotonic() - start)
+
+        # Neste side av samme søk, ellers samme søk med større radius
+        next_page_token = data.get("nextPageToken")
+        if next_page_token and page_count < MAX_PAGES:
+            push(kommune_nr, query, radius, next_page_token, page_count)
+        elif radius * RADIUS_GROWTH <= MAX_RADIUS:
+            push(kommune_nr, query, radius * RADIUS_GROWTH)
+
+    if outside:
+        print(f"  Forkastet {outside} treff utenfor området (geofence)")
+    for kommune_nr, count in found.items():
+        print(f"  Fant {count} leads for {kommune_navn.get(kommune_nr, kommune_nr)}")
+    return results
+
+
 def is_catalog_domain(domain: str) -> bool:
     """Sjekk om et domene er en kjent katalog-/oppslagsside."""
     domain = domain.lower()
@@ -401,27 +644,60 @@ def check_domain_guess(name: str) -> bool:
     for tld in (".no", ".com"):
         url = f"https://www.{slug}{tld}"
         try:
-            resp = requests.head(url, timeout=5, allow_redirects=True)
+            resp = get_client("web").head(url, timeout=5, allow_redirects=True)
             if resp.status_code < 400:
                 print(f"    Domenegjetting traff: {url}")
                 return True
-        except (requests.RequestException, UnicodeError):
+        except (http_client.RequestException, UnicodeError):
             pass
     return False
 
 
-def verify_no_website(lead: dict) -> bool:
+def check_website(lead: dict, cheap_first: bool = False) -> bool | None:
+    """
+    Sjekk om en bedrift har nettside: True (funnet), False (søk og domenegjetting
+    fant ingenting) eller None (uavgjort – Google-søket feilet eller ble hoppet
+    over pga. budsjett, og domenegjettingen traff ikke).
+    Med cheap_first prøves domenegjetting (to HEAD-kall) før Google-søket,
+    slik at søket spares for leads som avsløres billig.
+    """
+    name = lead["name"]
+
+    if cheap_first and check_domain_guess(name):
+        return True
+
+    searched = _search_finds_website(name, lead.get("sted", ""))
+    if searched:
+        return True
+
+    if not cheap_first and check_domain_guess(name):
+        return True
+
+    return None if searched is None else False
+
+
+def verify_no_website(lead: dict, cheap_first: bool = False) -> bool:
     """
     Verifiser at en bedrift IKKE har en nettside.
     Returnerer True hvis ingen nettside ble funnet (behold leadet).
     """
-    name = lead["name"]
-    sted = lead.get("sted", "")
+    return not check_website(lead, cheap_first)
+
 
-    if google_search is not None:
+def _search_finds_website(name: str, sted: str) -> bool | None:
+    """
+    Google-søk etter bedriftens egen nettside (utenom katalogsider).
+    Returnerer None hvis søket ikke ble gjort eller feilet.
+    """
+    if (google_search is not None or cassette.is_replaying()) and budget.current().allow("search"):
         try:
             query = f'"{name}" {sted}'
-            search_results = list(google_search(query, num_results=5))
+            if not cassette.is_replaying():
+                _search_bucket.acquire()
+            budget.current().record("search")
+            search_results = cassette.call(
+                "google_search", query, lambda: list(google_search(query, num_results=5))
+            )
 
             for url in search_results:
                 try:
@@ -436,31 +712,91 @@ def verify_no_website(lead: dict) -> bool:
                 norm_domain = re.sub(r"[^a-z0-9]", "", domain.lower())
                 if norm_name and norm_name in norm_domain:
                     print(f"    Fant nettside via søk: {url}")
-                    return False
+                    return True
 
         except Exception as e:
             print(f"    Google-søk feilet for '{name}': {e}")
+            # Typisk blokkering (429) – la alle tråder holde igjen en stund
+            _search_bucket.pause(SEARCH_BLOCKED_PAUSE)
+            return None
 
-    if check_domain_guess(name):
         return False
 
-    return True
+    return None
+
+
+def verify_leads(leads: list[dict], verdict_cache: dict[str, bool] | None = None) -> list[dict]:
+    """
+    Kjør verify_no_website på en liste leads og returner de som beholdes.
+    verdict_cache (lead-ID -> beholdes) lar langtkjørende prosesser hoppe over
+    leads som allerede er sjekket. Med tidsfrist stopper verifiseringen når det
+    ikke er tid til flere, og resten droppes (sorter viktigst først).
+    """
+    run_deadline = deadline.current()
+    verified = []
+    for i, lead in enumerate(leads):
+        if verdict_cache is not None and lead["id"] in verdict_cache:
+            if verdict_cache[lead["id"]]:
+                verified.append(lead)
+            continue
+
+        if not run_deadline.affords("verify"):
+            print(f"  Tidsfrist: {len(leads) - i} leads ble ikke verifisert og tas ikke med")
+            break
+
+        start = time.monotonic()
+        print(f"  [{i+1}/{len(leads)}] Sjekker: {lead['name']} ({lead['sted']})")
+        keep = verify_no_website(lead, cheap_first=run_deadline.enabled)
+        if verdict_cache is not None:
+            verdict_cache[lead["id"]] = keep
+        if keep:
+            verified.append(lead)
+            print(f"    -> Ingen nettside funnet (beholdes)")
+        else:
+            print(f"    -> Nettside funnet (fjernes)")
+
+        if i < len(leads) - 1 and not cassette.is_replaying():
+            time.sleep(1.5)
+        run_deadline.stats.observe_stage("verify", time.monotonic() - start)
+
+    print(f"\nVerifisering fullført: {len(verified)}/{len(leads)} leads beholdt")
+    return verified
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Hent leads fra Google Places (bedrifter uten nettside).")
+    parser.add_argument("--deadline", type=float, metavar="MIN",
+                        help="Stopp etter MIN minutter; skriv og importer leads som er ferdigbehandlet")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mål minne og tid per steg (rapport ved siden av leads.json)")
+    args = parser.parse_args()
+    run_deadline = deadline.start(args.deadline)
+    if args.profile:
+        profiling.enable(OUTPUT_PATH)
+
     print("=== AskerLeads Generator (Asker + Bærum) ===\n")
+    if run_deadline.enabled:
+        print(f"Tidsfrist: {args.deadline:g} min\n")
 
     # Steg 1: Svartelisting fra Supabase
     print("Steg 1: Henter svarteliste fra Supabase...")
-    blacklisted_ids = get_blacklisted_ids()
+    with profiling.stage("svarteliste"):
+        blacklisted_ids = get_blacklisted_ids()
 
     # Steg 2: Hent leads for alle lokasjoner
     print(f"\nSteg 2: Henter leads fra Google Places API...")
-    all_leads = []
-    for sted, location in LOCATIONS.items():
-        print(f"\n  --- {sted} ---")
-        leads = fetch_places(sted, location, blacklisted_ids)
-        all_leads.extend(leads)
+    with profiling.stage("places"):
+        if run_deadline.enabled:
+            # Søkene med høyest utbytte per sekund først, på tvers av lokasjoner
+            all_leads = fetch_places_by_yield(LOCATIONS, blacklisted_ids)
+            all_leads.sort(key=lambda l: -l["potentialScore"])
+        else:
+            all_leads = []
+            for kommune_nr, location in LOCATIONS.items():
+                sted = KOMMUNE_NAVN[kommune_nr]
+                print(f"\n  --- {sted} ---")
+                leads = fetch_places(sted, location, blacklisted_ids)
+                all_leads.extend(leads)
 
     if not all_leads:
         print("Ingen leads funnet. Sjekk API-nøkkelen og prøv igjen.")
@@ -469,32 +805,37 @@ def main():
 
     # Steg 3: Nettside-verifisering
     print(f"\nSteg 3: Verifiserer at {len(all_leads)} leads ikke har nettside...")
-    verified = []
-    for i, lead in enumerate(all_leads):
-        print(f"  [{i+1}/{len(all_leads)}] Sjekker: {lead['name']} ({lead['sted']})")
-        if verify_no_website(lead):
-            verified.append(lead)
-            print(f"    -> Ingen nettside funnet (beholdes)")
-        else:
-            print(f"    -> Nettside funnet (fjernes)")
-
-        if i < len(all_leads) - 1:
-            time.sleep(1.5)
-
-    print(f"\nVerifisering fullført: {len(verified)}/{len(all_leads)} leads beholdt")
+    with profiling.stage("verifisering"):
+        verified = verify_leads(all_leads)
 
     # Steg 4: Sorter etter vurdering/anmeldelser
     verified.sort(key=lambda l: (-l["rating"], -l["userRatingCount"]))
 
-    # Steg 5: Skriv resultater
-    write_results(verified)
+    # Steg 5: Generer beskrivelser kun for leads som faktisk skrives ut
+    with profiling.stage("beskrivelser"):
+        fill_info(verified)
+
+    # Steg 6: Skriv resultater
+    with profiling.stage("skriv"):
+        write_results(verified)
+
+    # Med tidsfrist skal leadene være klare i appen med en gang
+    if run_deadline.enabled:
+        with profiling.stage("import"):
+            brreg.import_to_supabase(verified)
+
+    if not cassette.is_replaying():
+        run_deadline.stats.save()
+    budget.current().report()
 
 
-def write_results(leads: list[dict]):
-    out_path = os.path.join(os.path.dirname(__file__), "public", "leads.json")
+def write_results(leads: list[dict], out_path: str | None = None):
+    out_path = out_path or OUTPUT_PATH
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # Interne felter (f.eks. _place for lat info-generering) skrives ikke
+    public_leads = [{k: v for k, v in lead.items() if not k.startswith("_")} for lead in leads]
     with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(leads, f, ensure_ascii=False, indent=2)
+        json.dump(public_leads, f, ensure_ascii=False, indent=2)
     print(f"\nSkrev {len(leads)} leads til {out_path}")
 
 
@@ -0,0 +1,156 @@
+"""
+Opt-in minne- og tidsprofilering per steg i pipelinen (--profile).
+
+Hvert steg i leads.py, brreg.py og import_to_supabase.py kjøres i
+profiling.stage(navn). Når profilering er slått på, måles for hvert steg:
+
+- topp minnebruk (tracemalloc-peak) og hvor mye som fortsatt er allokert etterpå
+- allokeringssteder (fil:linje) som endret seg mest i løpet av steget
+- funksjonene med mest egen tid og kumulativ tid (cProfile)
+
+Rapporten skrives som JSON ved siden av utdatafilen ved avslutning, f.eks.
+public/leads.json -> public/leads.profile.json, og et sammendrag skrives ut.
+cProfile måler kun hovedtråden (MX-oppslag i tråder vises som ventetid),
+mens tracemalloc dekker alle tråder. Uten --profile er stage() uten kostnad.
+"""
+
+from __future__ import annotations
+
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TOP_ALLOCATIONS = 15
+TOP_FUNCTIONS = 20
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+_report_path: str | None = None
+_stages: list[dict] = []
+_active = False
+
+
+def report_path_for(output_json: str) -> str:
+    """public/leads.json -> public/leads.profile.json"""
+    root, _ = os.path.splitext(output_json)
+    return f"{root}.profile.json"
+
+
+def enable(output_json: str):
+    """Slå på profilering; rapporten skrives ved siden av output_json ved avslutning."""
+    global _report_path
+    _report_path = report_path_for(output_json)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def enabled() -> bool:
+    return _report_path is not None
+
+
+def _short_path(path: str) -> str:
+    if path.startswith(_BASE_DIR):
+        return os.path.relpath(path, _BASE_DIR)
+    # Standardbibliotek/site-packages: behold pakke/fil
+    return os.path.join(*path.split(os.sep)[-2:]) if os.sep in path else path
+
+
+def _mb(size: int) -> float:
+    return round(size / (1024 * 1024), 3)
+
+
+def _allocation_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> list[dict]:
+    diffs = after.filter_traces(_SNAPSHOT_FILTERS).compare_to(before.filter_traces(_SNAPSHOT_FILTERS), "lineno")
+    sites = []
+    for diff in diffs[:TOP_ALLOCATIONS]:
+        frame = diff.traceback[0]
+        sites.append({
+            "site": f"{_short_path(frame.filename)}:{frame.lineno}",
+            "size_kb": round(diff.size / 1024, 1),
+            "size_diff_kb": round(diff.size_diff / 1024, 1),
+            "count": diff.count,
+            "count_diff": diff.count_diff,
+        })
+    return sites
+
+
+def _hot_functions(profile: cProfile.Profile) -> list[dict]:
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            "function": f"{_short_path(filename)}:{line}({name})",
+            "calls": calls,
+            "self_s": round(self_time, 4),
+            "cumulative_s": round(cumulative, 4),
+        }
+        for (filename, line, name), (_, calls, self_time, cumulative, _) in rows
+    ]
+
+
+@contextmanager
+def stage(name: str):
+    """Profiler et steg. Uten profilering (eller inne i et annet steg) gjøres ingenting."""
+    global _active
+    if not enabled() or _active:
+        yield
+        return
+
+    _active = True
+    tracemalloc.reset_peak()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    before = tracemalloc.take_snapshot()
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        seconds = time.perf_counter() - start
+        end_memory, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        _stages.append({
+            "stage": name,
+            "seconds": round(seconds, 3),
+            "peak_mb": _mb(peak),
+            "peak_above_start_mb": _mb(peak - start_memory),
+            "retained_mb": _mb(end_memory - start_memory),
+            "top_allocations": _allocation_sites(before, after),
+            "hot_functions": _hot_functions(profile),
+        })
+        _active = False
+
+
+@atexit.register
+def write_report():
+    if not enabled() or not _stages:
+        return
+    os.makedirs(os.path.dirname(_report_path) or ".", exist_ok=True)
+    with open(_report_path, "w", encoding="utf-8") as f:
+        json.dump({"stages": _stages}, f, ensure_ascii=False, indent=2)
+
+    print("\n=== Profilering per steg ===")
+    print(f"  {'Steg':<28} {'tid':>8} {'peak':>10} {'beholdt':>10}")
+    for entry in _stages:
+        print(
+            f"  {entry['stage']:<28} {entry['seconds']:>7.1f}s {entry['peak_mb']:>8.1f}MB "
+            f"{entry['retained_mb']:>8.1f}MB"
+        )
+        if entry["top_allocations"]:
+            top = entry["top_allocations"][0]
+            print(f"    størst endring: {top['site']} ({top['size_diff_kb']:+.0f} KB)")
+    print(f"  Rapport: {_report_path}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Avled leadsettet på nytt fra arkivet over rå API-svar (se archive.py).
+
+Bruker gjeldende regler (EXCLUDED_TYPES, INDUSTRY_MAP, RELEVANTE_NACE,
+geofence, scoring, svarteliste og TARGET_RESULTS/TOP_N) på siste arkiverte
+versjon av hvert treff, uten kall mot Places eller Brreg. Svartelisten hentes
+fra Supabase hvis konfigurert. Nettsideverifisering (Google-søk) og
+Gemini-beskrivelser hoppes over, siden de krever nett; info-tekst lages med
+malene.
+
+Siden leadene ikke er verifisert, skrives de til egne filer
+(public/leads.rebuild.json og public/leads-brreg.rebuild.json) og ikke til
+filene import_to_supabase.py leser. Sammenlign, og kopier over for hånd.
+
+Kjør:
+    python rebuild.py                              # hele arkivet
+    python rebuild.py --from 2026-10-01 --to 2026-10-19
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import archive
+import brreg
+import leads
+
+PLACES_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "public", "leads.rebuild.json")
+BRREG_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "public", "leads-brreg.rebuild.json")
+
+
+def rebuild_places(date_from: str | None = None, date_to: str | None = None,
+                   blacklisted_ids: set[str] | None = None) -> list[dict]:
+    fence = leads.get_geofence()
+    kommune_navn = leads.KOMMUNE_NAVN
+    blacklisted_ids = blacklisted_ids or set()
+    results = []
+    outside = 0
+    for row in archive.latest_items("places", date_from, date_to):
+        p = row["item"]
+        if not leads.is_candidate_place(p) or (p.get("id") or row["item_id"]) in blacklisted_ids:
+            continue
+        lead_sted = leads.place_sted(p, row["area"], fence, kommune_navn)
+        if lead_sted is None:
+            outside += 1
+            continue
+        lead = leads.place_to_lead(p, p.get("id") or row["item_id"], lead_sted)
+        lead["info"] = leads._generate_info_template(lead.pop("_place"), lead["industry"])
+        results.append(lead)
+    if outside:
+        print(f"  Forkastet {outside} treff utenfor området (geofence)")
+    results.sort(key=lambda l: (-l["rating"], -l["userRatingCount"]))
+    # Samme tak som fetch_places: TARGET_RESULTS per kommune
+    per_sted: dict[str, int] = {}
+    capped = []
+    for lead in results:
+        if per_sted.get(lead["sted"], 0) < leads.TARGET_RESULTS:
+            per_sted[lead["sted"]] = per_sted.get(lead["sted"], 0) + 1
+            capped.append(lead)
+    return capped
+
+
+def rebuild_brreg(date_from: str | None = None, date_to: str | None = None,
+                  blacklisted_ids: set[str] | None = None) -> list[dict]:
+    fra_dato = (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d")
+    results = []
+    for row in archive.latest_items("brreg", date_from, date_to):
+        enhet = row["item"]
+        # Samme vindu som fetch_brreg_enheter (registrert siste 6 mnd)
+        if (enhet.get("registreringsdatoEnhetsregisteret") or "") < fra_dato:
+            continue
+        kommune_nr = row["area"]
+        lead = brreg.enhet_to_lead(enhet, kommune_nr, brreg.KOMMUNER.get(kommune_nr, kommune_nr),
+                                   blacklisted_ids or set())
+        if lead is not None:
+            results.append(lead)
+    results.sort(key=lambda l: -l["potentialScore"])
+    return results[:brreg.TOP_N]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avled leads på nytt fra arkivet, uten API-kall.")
+    parser.add_argument("--from", dest="date_from", help="Første kjøredato (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="Siste kjøredato (YYYY-MM-DD)")
+    parser.add_argument("--places-output", default=PLACES_OUTPUT_PATH,
+                        help="Utdatafil for Places-leads (standard public/leads.rebuild.json)")
+    parser.add_argument("--brreg-output", default=BRREG_OUTPUT_PATH,
+                        help="Utdatafil for Brreg-leads (standard public/leads-brreg.rebuild.json)")
+    args = parser.parse_args()
+
+    print("=== Rebuild fra arkiv ===\n")
+    start = time.monotonic()
+
+    places_leads = rebuild_places(args.date_from, args.date_to, leads.get_blacklisted_ids())
+    print(f"  Places: {len(places_leads)} leads")
+    brreg_leads = rebuild_brreg(args.date_from, args.date_to, brreg.get_blacklisted_ids())
+    print(f"  Brreg: {len(brreg_leads)} leads")
+
+    leads.write_results(places_leads, args.places_output)
+    brreg.write_results(brreg_leads, args.brreg_output)
+    print(f"\nFerdig på {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Konfigurerbare regionsett (kommuner) for lead-pipelinen.
+
+Regionsettene ligger i regions.json. Et sett er enten en liste med kommuner
+eller et filnavn (relativt til regions.json) som inneholder en slik liste.
+Hver kommune har kommunenummer, navn, koordinater (for Places-søk) og en
+valgfri lokasjonsbonus for Brreg-scoringen.
+
+Velg sett med miljøvariabelen REGION_SET (standard: "default" i regions.json),
+og en annen konfigurasjonsfil med REGIONS_FILE.
+
+Generer landsdekkende sett fra Kartverkets kommuneinfo-API:
+    python regions.py --generate norge
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+
+REGIONS_FILE = os.getenv("REGIONS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "regions.json"))
+
+GEONORGE_URL = "https://ws.geonorge.no/kommuneinfo/v1/kommuner"
+
+
+def _read_config(path: str | None = None) -> dict:
+    with open(path or REGIONS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def default_set(path: str | None = None) -> str:
+    """Navnet på regionsettet som brukes når ingenting er angitt."""
+    return os.getenv("REGION_SET") or _read_config(path).get("default")
+
+
+def load_regions(region_set: str | None = None, path: str | None = None) -> list[dict]:
+    """Last et regionsett fra konfigurasjonsfilen."""
+    path = path or REGIONS_FILE
+    config = _read_config(path)
+    name = region_set or default_set(path)
+    sets = config.get("sets", {})
+    if name not in sets:
+        raise KeyError(f"Ukjent regionsett '{name}' i {path} (har: {', '.join(sets)})")
+
+    regions = sets[name]
+    if isinstance(regions, str):
+        with open(os.path.join(os.path.dirname(path), regions), "r", encoding="utf-8") as f:
+            regions = json.load(f)
+
+    for region in regions:
+        region["kommunenummer"] = str(region["kommunenummer"]).zfill(4)
+        region["navn"] = region["navn"].upper()
+    return regions
+
+
+def locations(regions: list[dict]) -> dict[str, dict]:
+    """
+    Regioner som LOCATIONS-oppslag for Places-søk (kommunenummer -> senterpunkt).
+    Nøkkelen er kommunenummer fordi navn ikke er unike (f.eks. Herøy, Våler).
+    """
+    return {
+        r["kommunenummer"]: {"latitude": r["latitude"], "longitude": r["longitude"]}
+        for r in regions
+        if r.get("latitude") is not None and r.get("longitude") is not None
+    }
+
+
+def kommuner(regions: list[dict]) -> dict[str, str]:
+    """Regioner som KOMMUNER-oppslag for Brreg (kommunenummer -> navn)."""
+    return {r["kommunenummer"]: r["navn"] for r in regions}
+
+
+def kommune_bonus(regions: list[dict]) -> dict[str, int]:
+    """Lokasjonsbonus i Brreg-scoringen per kommunenummer."""
+    return {r["kommunenummer"]: r.get("bonus", 0) for r in regions}
+
+
+def shard_regions(regions: list[dict], num_shards: int) -> list[list[dict]]:
+    """Del regionene deterministisk i num_shards omtrent like store shards."""
+    ordered = sorted(regions, key=lambda r: r["kommunenummer"])
+    shards = [ordered[i::num_shards] for i in range(max(1, num_shards))]
+    return [s for s in shards if s]
+
+
+def fetch_from_geonorge() -> list[dict]:
+    """Hent alle kommuner med senterpunkt fra Kartverkets kommuneinfo-API."""
+    from http_client import get_client
+
+    client = get_client("geonorge")
+    resp = client.get(GEONORGE_URL)
+    resp.raise_for_status()
+
+    regions = []
+    for kommune in resp.json():
+        nr = kommune["kommunenummer"]
+        detail = client.get(f"{GEONORGE_URL}/{nr}")
+        if detail.status_code != 200:
+            print(f"  Kunne ikke hente {nr}: {detail.status_code}")
+            continue
+        lon, lat = (detail.json().get("punktIOmrade") or {}).get("coordinates", [None, None])
+        regions.append({
+            "kommunenummer": nr,
+            "navn": (kommune.get("kommunenavnNorsk") or kommune.get("kommunenavn", "")).upper(),
+            "latitude": lat,
+            "longitude": lon,
+            "bonus": 0,
+        })
+    print(f"  Hentet {len(regions)} kommuner fra Geonorge")
+    return regions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vis eller generer regionsett.")
+    parser.add_argument("--generate", metavar="SETT", help="Generer landsdekkende sett fra Geonorge")
+    parser.add_argument("--set", dest="region_set", help="Regionsett som skal vises")
+    args = parser.parse_args()
+
+    if args.generate:
+        config = _read_config()
+        target = config.get("sets", {}).get(args.generate)
+        filename = target if isinstance(target, str) else f"regions-{args.generate}.json"
+        regions = fetch_from_geonorge()
+        with open(os.path.join(os.path.dirname(REGIONS_FILE), filename), "w", encoding="utf-8") as f:
+            json.dump(regions, f, ensure_ascii=False, indent=2)
+        print(f"Skrev {len(regions)} kommuner til {filename}")
+        return
+
+    regions = load_regions(args.region_set)
+    for r in regions:
+        print(f"  {r['kommunenummer']} {r['navn']:<20} ({r.get('latitude')}, {r.get('longitude')}) bonus {r.get('bonus', 0)}")
+    print(f"{len(regions)} kommuner")
+
+
+if __name__ == "__main__":
+    main()
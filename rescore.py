@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Reberegn potential_score for alle leads i Supabase med gjeldende formel.
+
+Scoreformelen i leads.calculate_score og brreg.calculate_score brukes bare
+når et lead genereres første gang, og Brreg-bonusen for registreringsalder
+endrer seg dag for dag. Dette skriptet:
+
+  - strømmer leads fra Supabase med keyset-paginering (id > siste id)
+  - reberegner score batchvis: Google Places-leads fra lagrede felter,
+    Brreg-leads ved å hente enhetene på nytt i ett kall per batch
+    (organisasjonsnummer=a,b,c,...), inkludert e-post/MX-trekket
+  - skriver kun rader der scoren faktisk er endret, gruppert per ny score
+    (én update ... in (ids) per scoreverdi), med flere batcher parallelt
+
+Kjør:
+    python rescore.py            # reberegn og oppdater
+    python rescore.py --dry-run  # vis hva som ville blitt endret
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+import brreg
+import cassette
+import leads
+from email_enrichment import enrich_leads
+import http_client
+from http_client import get_client
+from lazy_imports import create_client
+
+load_dotenv()
+
+PAGE_SIZE = 1000
+BRREG_BATCH = 100
+WORKERS = 4
+
+COLUMNS = "id, source, rating, user_rating_count, has_website, potential_score"
+
+
+def iter_pages(client, columns: str = COLUMNS, filters: dict | None = None, page_size: int = PAGE_SIZE):
+    """Strøm leads fra Supabase med keyset-paginering på id (filters: kolonne -> lik verdi)."""
+    last_id = ""
+    while True:
+        def fetch():
+            query = client.table("leads").select(columns)
+            for column, value in (filters or {}).items():
+                query = query.eq(column, value)
+            query = query.order("id").limit(page_size)
+            if last_id:
+                query = query.gt("id", last_id)
+            return query.execute().data or []
+
+        rows = cassette.call("supabase", ["leads.page", columns, filters, last_id, page_size], fetch)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def fetch_enheter(org_nrs: list[str]) -> dict[str, dict]:
+    """Hent Brreg-enheter for en batch organisasjonsnumre i ett kall."""
+    enheter = {}
+    for start in range(0, len(org_nrs), BRREG_BATCH):
+        chunk = org_nrs[start:start + BRREG_BATCH]
+        try:
+            resp = get_client("brreg").get(
+                brreg.API_URL, params={"organisasjonsnummer": ",".join(chunk), "size": len(chunk)}
+            )
+        except http_client.RequestException as e:
+            print(f"  Brreg-oppslag feilet: {e}")
+            continue
+        if resp.status_code != 200:
+            print(f"  Brreg API error {resp.status_code}: {resp.text[:200]}")
+            continue
+        for enhet in resp.json().get("_embedded", {}).get("enheter", []):
+            enheter[str(enhet.get("organisasjonsnummer", ""))] = enhet
+    return enheter
+
+
+def _brreg_scores(rows: list[dict]) -> dict[str, int]:
+    enheter = fetch_enheter([row["id"] for row in rows])
+    scored = []
+    for row in rows:
+        enhet = enheter.get(row["id"])
+        if enhet is None:
+            # Slettet/ukjent i Brreg – behold eksisterende score
+            continue
+        kommune_nr = (enhet.get("forretningsadresse") or {}).get("kommunenummer", "")
+        scored.append({
+            "id": row["id"],
+            # E-posten fra Brreg, ikke den lagrede: samme kilde som +20-bonusen i scoren
+            "notes": enhet.get("epostadresse") or "",
+            "potentialScore": brreg.calculate_score(enhet, kommune_nr),
+        })
+    if scored:
+        enrich_leads(scored)
+    return {lead["id"]: lead["potentialScore"] for lead in scored}
+
+
+def rescore_batch(rows: list[dict]) -> dict[str, int]:
+    """Reberegn score for en batch rader. Returnerer kun endrede: id -> ny score."""
+    new_scores = {
+        row["id"]: leads.calculate_score(
+            row.get("rating") or 0, row.get("user_rating_count") or 0, bool(row.get("has_website"))
+        )
+        for row in rows
+        if row.get("source") != "brreg"
+    }
+    brreg_rows = [row for row in rows if row.get("source") == "brreg"]
+    if brreg_rows:
+        new_scores.update(_brreg_scores(brreg_rows))
+
+    old_scores = {row["id"]: row.get("potential_score") for row in rows}
+    return {lead_id: score for lead_id, score in new_scores.items() if old_scores.get(lead_id) != score}
+
+
+def apply_changes(client, changes: dict[str, int]):
+    """Skriv endrede scorer, én update per distinkt scoreverdi."""
+    by_score = defaultdict(list)
+    for lead_id, score in changes.items():
+        by_score[score].append(lead_id)
+    for score, ids in sorted(by_score.items()):
+        cassette.call(
+            "supabase", ["leads.update(potential_score)", score, ids],
+            lambda: len(client.table("leads").update({"potential_score": score}).in_("id", ids).execute().data or []),
+        )
+
+
+def rescore(client, dry_run: bool = False, workers: int = WORKERS) -> tuple[int, int]:
+    """Reberegn alle leads. Returnerer (antall sjekket, antall endret)."""
+    total = 0
+    changed = 0
+
+    def process(rows):
+        changes = rescore_batch(rows)
+        if changes and not dry_run:
+            apply_changes(client, changes)
+        return len(rows), changes
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for rows in iter_pages(client):
+            futures.append(pool.submit(process, rows))
+            # Begrens antall sider i minnet samtidig
+            while len(futures) >= workers * 2:
+                n, changes = futures.pop(0).result()
+                total += n
+                changed += len(changes)
+        for future in futures:
+            n, changes = future.result()
+            total += n
+            changed += len(changes)
+
+    return total, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reberegn potential_score for leads i Supabase.")
+    parser.add_argument("--dry-run", action="store_true", help="Ikke skriv endringer til Supabase")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Antall batcher parallelt")
+    args = parser.parse_args()
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    client = None
+    if not cassette.is_replaying():
+        if not url or not key or not create_client:
+            print("❌ Feil: SUPABASE_URL og SUPABASE_SERVICE_ROLE_KEY må være satt i .env")
+            return
+        client = create_client(url, key)
+
+    print("=== Reberegning av potential_score ===\n")
+    start = time.monotonic()
+    total, changed = rescore(client, args.dry_run, args.workers)
+    action = "ville blitt oppdatert" if args.dry_run else "oppdatert"
+    print(f"\n✅ {total} leads sjekket, {changed} {action} ({time.monotonic() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Bakgrunnsjobb som re-verifiserer ventende (pending) leads i Supabase.
+
+Leads kan bli liggende som pending i ukevis, og noen av bedriftene lanserer
+nettside i mellomtiden. Jobben legger alle pending-leads uten nettside i en
+prioritetskø etter hvor lenge det er siden de ble sjekket (eller opprettet,
+hvis de aldri er re-sjekket), kjører verify_no_website-logikken parallelt på
+de mest utdaterte, og markerer leads som nå har nettside (has_website = true)
+i batchvise oppdateringer.
+
+Et budsjett per kjøring (antall søk) sørger for at jobben ikke spiser av
+søkekvoten som trengs for nye leads. Tidspunkt for siste sjekk lagres lokalt
+i reverify-state.json.
+
+Kjør:
+    python reverify.py                 # standardbudsjett
+    python reverify.py --budget 50 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+import budget
+import cassette
+import leads
+from lazy_imports import create_client
+from rescore import iter_pages
+
+load_dotenv()
+
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reverify-state.json")
+
+# Maks antall leads (= Google-søk) per kjøring
+DEFAULT_BUDGET = 100
+WORKERS = 4
+UPDATE_BATCH = 100
+
+# Leads sjekket nyere enn dette hoppes over
+RECHECK_AFTER = 14 * 24 * 3600
+
+
+def load_state(path: str | None = None) -> dict[str, float]:
+    """Les lead-ID -> tidspunkt (epoch) for siste re-verifisering."""
+    try:
+        with open(path or STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state: dict[str, float], path: str | None = None):
+    path = path or STATE_PATH
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _created_epoch(value) -> float:
+    if not value:
+        return 0.0
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    except ValueError:
+        return 0.0
+
+
+def build_queue(client, state: dict[str, float], now: float) -> list[tuple[float, str, dict]]:
+    """Prioritetskø over pending-leads: eldst siste sjekk (eller opprettelse) først."""
+    queue = []
+    filters = {"status": "pending", "has_website": False}
+    for rows in iter_pages(client, "id, name, email, created_at", filters):
+        for row in rows:
+            last_checked = state.get(row["id"]) or _created_epoch(row.get("created_at"))
+            if state.get(row["id"]) and now - last_checked < RECHECK_AFTER:
+                continue
+            # DB-kolonnen email inneholder sted (se import_to_supabase)
+            lead = {"id": row["id"], "name": row.get("name") or "", "sted": row.get("email") or ""}
+            queue.append((last_checked, row["id"], lead))
+    heapq.heapify(queue)
+    return queue
+
+
+def mark_has_website(client, ids: list[str]):
+    """Marker leads som har fått nettside, i batcher."""
+    for start in range(0, len(ids), UPDATE_BATCH):
+        batch = ids[start:start + UPDATE_BATCH]
+        cassette.call(
+            "supabase", ["leads.update(has_website)", batch],
+            lambda: len(client.table("leads").update({"has_website": True}).in_("id", batch).execute().data or []),
+        )
+        print(f"   ✓ Markerte {len(batch)} leads med nettside (batch {start // UPDATE_BATCH + 1})")
+
+
+def reverify(client, search_budget: int = DEFAULT_BUDGET, workers: int = WORKERS, dry_run: bool = False) -> list[str]:
+    """Re-verifiser de mest utdaterte pending-leadene innenfor budsjettet."""
+    state = load_state()
+    now = time.time()
+    queue = build_queue(client, state, now)
+    print(f"  {len(queue)} pending-leads i køen, budsjett {search_budget} søk")
+
+    selected = [heapq.heappop(queue)[2] for _ in range(min(search_budget, len(queue)))]
+    if not selected:
+        return []
+
+    def check(lead):
+        return lead["id"], leads.check_website(lead)
+
+    has_website = []
+    undecided = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for lead_id, found in pool.map(check, selected):
+            if found is None:
+                # Søket feilet/ble hoppet over – ikke stemple, prøv igjen neste kjøring
+                undecided += 1
+                continue
+            state[lead_id] = now
+            if found:
+                has_website.append(lead_id)
+
+    print(f"\n  {len(has_website)}/{len(selected)} leads har nå nettside")
+    if undecided:
+        print(f"  {undecided} leads kunne ikke sjekkes (søk feilet eller budsjett nådd) – tas igjen neste kjøring")
+    if has_website and not dry_run:
+        mark_has_website(client, has_website)
+    if not dry_run:
+        save_state(state)
+    return has_website
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-verifiser pending-leads etter alder.")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="Maks antall søk denne kjøringen")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="Ikke skriv til Supabase eller state-fil")
+    args = parser.parse_args()
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    client = None
+    if not cassette.is_replaying():
+        if not url or not key or not create_client:
+            print("❌ Feil: SUPABASE_URL og SUPABASE_SERVICE_ROLE_KEY må være satt i .env")
+            return
+        client = create_client(url, key)
+
+    print("=== Re-verifisering av pending-leads ===\n")
+    reverify(client, args.budget, args.workers, args.dry_run)
+    budget.current().report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Shardet kjøring av lead-pipelinen over mange kommuner.
+
+Et regionsett (se regions.py) deles i shards. Hver shard kjører Places-søk +
+nettsideverifisering og Brreg-henting + e-postberiking for sine kommuner, og
+skriver sitt eget resultat til shards/<sett>/out/shard-NNN.json. Til slutt
+slår merge-steget sammen alle shard-resultater, fjerner duplikater og
+rangerer, og skriver public/leads.json og public/leads-brreg.json.
+
+Shards kan kjøres i en prosesspool på én maskin, eller fordeles på flere
+maskiner via en filbasert arbeidskø (delt katalog). Arbeidere tar en shard
+ved å flytte oppgavefilen atomisk fra pending/ til claimed/.
+
+Kjør:
+    python shards.py run --set norge --shards 32 --workers 4
+    python shards.py enqueue --set norge --shards 64   # én gang
+    python shards.py work --set norge                  # på hver maskin
+    python shards.py merge --set norge
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import archive
+import brreg
+import budget
+import cassette
+import leads
+import regions
+from email_enrichment import enrich_leads
+
+SHARDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shards")
+
+# Hvor lenge en shard kan være tatt før den legges tilbake i køen (sekunder)
+CLAIM_TIMEOUT = 4 * 3600
+
+
+def _set_dir(region_set: str, base_dir: str | None = None) -> str:
+    return os.path.join(base_dir or SHARDS_DIR, region_set)
+
+
+def _write_json(path: str, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _clear_run(set_dir: str, *subdirs: str):
+    """
+    Fjern resultater og køfiler fra en tidligere kjøring, slik at merge bare
+    leser shards fra denne kjøringen (ikke gamle shard-NNN.json fra et annet
+    antall shards, eller forrige resultat for en shard som feiler nå).
+    """
+    for name in subdirs:
+        shutil.rmtree(os.path.join(set_dir, name), ignore_errors=True)
+
+
+def use_region_set(region_set: str):
+    """
+    Ta i bruk regionsettet i denne prosessen. leads og brreg leser REGION_SET ved
+    import, så uten dette ville arbeidere (og fork-ede pool-prosesser) brukt
+    standardsettet for stedsnavn, geofence og lokasjonsbonus.
+    """
+    os.environ["REGION_SET"] = region_set
+    region_list = regions.load_regions(region_set)
+    leads.use_regions(region_list)
+    brreg.use_regions(region_list)
+
+
+def run_shard(shard_id: int, shard: list[dict], out_path: str, region_set: str) -> int:
+    """Kjør hele pipelinen for kommunene i én shard og skriv resultatet."""
+    print(f"\n=== Shard {shard_id}: {len(shard)} kommuner ===")
+    use_region_set(region_set)
+    # Egen kassett per shard, ellers skriver pool-prosessene over hverandres opptak
+    cassette.use_part(f"shard-{shard_id:03d}")
+    try:
+        return _run_shard_pipeline(shard_id, shard, out_path)
+    finally:
+        # Prosesspool-arbeidere kjører ikke atexit, så arkiv og kassett lukkes eksplisitt
+        archive.flush()
+        cassette.use(None, None)
+
+
+def _run_shard_pipeline(shard_id: int, shard: list[dict], out_path: str) -> int:
+    budget.reset()
+    blacklisted_ids = leads.get_blacklisted_ids()
+    leads.use_geofence(regions.kommuner(shard))
+    shard_leads = []
+
+    for region in shard:
+        sted = region["navn"]
+        location = regions.locations([region]).get(region["kommunenummer"])
+        if location:
+            print(f"\n  --- Places: {sted} ---")
+            found = leads.fetch_places(sted, location, blacklisted_ids)
+            shard_leads.extend(leads.verify_leads(found))
+
+    found = brreg.fetch_brreg_enheter(blacklisted_ids, regions.kommuner(shard))
+    enrich_leads(found)
+    shard_leads.extend(found)
+
+    _write_json(out_path, {
+        "shard": shard_id,
+        "kommuner": [r["kommunenummer"] for r in shard],
+        "leads": shard_leads,
+    })
+    print(f"  Shard {shard_id}: skrev {len(shard_leads)} leads til {out_path}")
+    budget.current().report()
+    return len(shard_leads)
+
+
+def run_local(region_set: str, num_shards: int, workers: int, base_dir: str | None = None):
+    """Kjør alle shards i en prosesspool på denne maskinen (tømmer out/ først)."""
+    shards = regions.shard_regions(regions.load_regions(region_set), num_shards)
+    set_dir = _set_dir(region_set, base_dir)
+    _clear_run(set_dir, "out")
+    out_dir = os.path.join(set_dir, "out")
+    print(f"Kjører {len(shards)} shards med {workers} prosesser...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(run_shard, i, shard, os.path.join(out_dir, f"shard-{i:03d}.json"), region_set): i
+            for i, shard in enumerate(shards)
+        }
+        for future in as_completed(futures):
+            shard_id = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  Shard {shard_id} feilet: {e}")
+
+
+def enqueue(region_set: str, num_shards: int, base_dir: str | None = None):
+    """Legg alle shards for et regionsett i køen (tømmer pending/, out/, done/ og failed/ først)."""
+    shards = regions.shard_regions(regions.load_regions(region_set), num_shards)
+    set_dir = _set_dir(region_set, base_dir)
+    claimed_dir = os.path.join(set_dir, "claimed")
+    if os.path.isdir(claimed_dir) and os.listdir(claimed_dir):
+        print(f"⚠️  {claimed_dir} har shards fra en tidligere kjøring som fortsatt er tatt")
+    _clear_run(set_dir, "pending", "out", "done", "failed")
+    pending_dir = os.path.join(set_dir, "pending")
+    for i, shard in enumerate(shards):
+        _write_json(os.path.join(pending_dir, f"shard-{i:03d}.json"), {"shard": i, "regions": shard})
+    print(f"La {len(shards)} shards i køen {pending_dir}")
+
+
+def _requeue_stale(set_dir: str):
+    claimed_dir = os.path.join(set_dir, "claimed")
+    if not os.path.isdir(claimed_dir):
+        return
+    for name in os.listdir(claimed_dir):
+        path = os.path.join(claimed_dir, name)
+        try:
+            if time.time() - os.path.getmtime(path) > CLAIM_TIMEOUT:
+                task_name = name.split("@", 1)[0]
+                os.replace(path, os.path.join(set_dir, "pending", task_name))
+                print(f"  La {task_name} tilbake i køen (utløpt)")
+        except FileNotFoundError:
+            pass
+
+
+def _claim(set_dir: str) -> str | None:
+    """Ta neste shard fra køen. Atomisk rename sikrer at kun én arbeider får den."""
+    pending_dir = os.path.join(set_dir, "pending")
+    claimed_dir = os.path.join(set_dir, "claimed")
+    os.makedirs(claimed_dir, exist_ok=True)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    for name in sorted(os.listdir(pending_dir)) if os.path.isdir(pending_dir) else []:
+        if not name.endswith(".json"):
+            continue
+        target = os.path.join(claimed_dir, f"{name}@{worker}")
+        try:
+            os.rename(os.path.join(pending_dir, name), target)
+        except FileNotFoundError:
+            continue
+        # rename beholder mtime fra enqueue; claim-tiden er det _requeue_stale måler mot
+        try:
+            os.utime(target)
+        except FileNotFoundError:
+            continue
+        return target
+    return None
+
+
+def work(region_set: str, base_dir: str | None = None):
+    """Arbeider: ta shards fra køen til den er tom."""
+    set_dir = _set_dir(region_set, base_dir)
+    _requeue_stale(set_dir)
+    done = 0
+    while True:
+        claimed = _claim(set_dir)
+        if claimed is None:
+            break
+        task_name = os.path.basename(claimed).split("@", 1)[0]
+        try:
+            with open(claimed, "r", encoding="utf-8") as f:
+                task = json.load(f)
+        except FileNotFoundError:
+            continue
+        try:
+            run_shard(task["shard"], task["regions"], os.path.join(set_dir, "out", task_name), region_set)
+            status = "done"
+        except Exception as e:
+            print(f"  Shard {task['shard']} feilet, flyttes til failed/: {e}")
+            status = "failed"
+        os.makedirs(os.path.join(set_dir, status), exist_ok=True)
+        try:
+            os.replace(claimed, os.path.join(set_dir, status, task_name))
+        except FileNotFoundError:
+            # Lagt tilbake i køen av en annen arbeider (utløpt) – den kjøres på nytt der
+            print(f"  {task_name} var ikke lenger tatt av denne arbeideren")
+            continue
+        if status == "done":
+            done += 1
+    print(f"Køen er tom – {done} shards kjørt av denne arbeideren")
+
+
+def _phone_key(phone: str) -> str:
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-8:] if len(digits) >= 8 else ""
+
+
+def _rank_key(lead: dict):
+    return (-lead.get("potentialScore", 0), -lead.get("rating", 0), -lead.get("userRatingCount", 0))
+
+
+def merge(region_set: str, top: int | None = None, base_dir: str | None = None):
+    """Slå sammen shard-resultater, fjern duplikater og ranger."""
+    out_dir = os.path.join(_set_dir(region_set, base_dir), "out")
+    files = sorted(f for f in os.listdir(out_dir) if f.endswith(".json")) if os.path.isdir(out_dir) else []
+    if not files:
+        print(f"Ingen shard-resultater i {out_dir}")
+        return
+
+    all_leads = []
+    for name in files:
+        with open(os.path.join(out_dir, name), "r", encoding="utf-8") as f:
+            all_leads.extend(json.load(f).get("leads", []))
+
+    # Best først, slik at duplikater beholder varianten med høyest score
+    all_leads.sort(key=_rank_key)
+    seen_ids = set()
+    seen_phones = set()
+    unique = []
+    for lead in all_leads:
+        phone = _phone_key(lead.get("phone", ""))
+        if lead["id"] in seen_ids or (phone and phone in seen_phones):
+            continue
+        seen_ids.add(lead["id"])
+        if phone:
+            seen_phones.add(phone)
+        unique.append(lead)
+
+    print(f"Slo sammen {len(files)} shards: {len(all_leads)} leads, {len(unique)} etter duplikatfjerning")
+
+    places_leads = [l for l in unique if l.get("source", "google_places") == "google_places"]
+    brreg_leads = [l for l in unique if l.get("source") == "brreg"]
+    places_leads.sort(key=lambda l: (-l["rating"], -l["userRatingCount"]))
+    brreg_leads.sort(key=lambda l: -l["potentialScore"])
+    if top:
+        places_leads = places_leads[:top]
+        brreg_leads = brreg_leads[:top]
+
+    # Beskrivelser genereres først nå, kun for leads som overlevde dedupe og topp-N
+    leads.fill_info(places_leads)
+    leads.write_results(places_leads)
+    brreg.write_results(brreg_leads)
+    budget.current().report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shardet kjøring av lead-pipelinen.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Kjør alle shards i en lokal prosesspool")
+    p_run.add_argument("--shards", type=int, default=os.cpu_count() or 4)
+    p_run.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+
+    p_enqueue = sub.add_parser("enqueue", help="Legg shards i den filbaserte køen")
+    p_enqueue.add_argument("--shards", type=int, default=64)
+
+    sub.add_parser("work", help="Ta og kjør shards fra køen til den er tom")
+
+    p_merge = sub.add_parser("merge", help="Slå sammen og ranger shard-resultater")
+    p_merge.add_argument("--top", type=int, default=None, help="Behold topp N per kilde")
+
+    for p in (p_run, p_enqueue, sub.choices["work"], p_merge):
+        p.add_argument("--set", dest="region_set", default=None, help="Regionsett fra regions.json")
+        p.add_argument("--dir", dest="base_dir", default=None, help="Delt katalog for køen/resultater")
+
+    args = parser.parse_args()
+    region_set = args.region_set or regions.default_set()
+
+    if args.command == "run":
+        run_local(region_set, args.shards, args.workers, args.base_dir)
+        merge(region_set, base_dir=args.base_dir)
+    elif args.command == "enqueue":
+        enqueue(region_set, args.shards, args.base_dir)
+    elif args.command == "work":
+        work(region_set, args.base_dir)
+    elif args.command == "merge":
+        merge(region_set, args.top, args.base_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,10 @@ export interface Lead {
   
   source?: "google_places" | "brreg";
 
+  // Koordinater fra Google Places (places.location)
+  latitude?: number | null;
+  longitude?: number | null;
+
   // Supabase-felter
   status?: "pending" | "accepted" | "rejected" | "no_answer" | "call_later";
   last_called_at?: string;
@@ -0,0 +1,96 @@
+"""
+Tester for email_enrichment.py: normalisering og validering, ett oppslag per
+domene med cache, og trekk i score kun for døde domener.
+
+Kjør:
+    python -m unittest test_email_enrichment
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import unittest
+
+from email_enrichment import (
+    DEAD_DOMAIN_PENALTY,
+    DnsCache,
+    StubResolver,
+    check_mx_domains,
+    enrich_leads,
+    is_valid_email,
+    normalize_email,
+)
+
+
+def _enrich(leads: list[dict], resolver, cache: DnsCache | None = None) -> dict[str, int]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return enrich_leads(leads, resolver, cache if cache is not None else DnsCache())
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_email("  <mailto:Post@Firma.NO.>  "), "post@firma.no")
+        self.assertEqual(normalize_email("post@firma.no?subject=hei"), "post@firma.no")
+        self.assertEqual(normalize_email("post@bærum.no"), "post@xn--brum-voa.no")
+        self.assertEqual(normalize_email("ikke-en-adresse"), "")
+        self.assertEqual(normalize_email("a@b@c.no"), "")
+        self.assertEqual(normalize_email(None), "")
+
+    def test_validate(self):
+        self.assertTrue(is_valid_email("post@firma.no"))
+        self.assertFalse(is_valid_email("post@firma"))
+        self.assertFalse(is_valid_email("post @firma.no"))
+        self.assertFalse(is_valid_email(f"{'a' * 65}@firma.no"))
+        self.assertFalse(is_valid_email(""))
+
+
+class LookupTest(unittest.TestCase):
+    def test_one_lookup_per_domain_and_cache_hits(self):
+        resolver = StubResolver({"dead.no": False})
+        cache = DnsCache()
+        result = check_mx_domains(["firma.no", "dead.no", "firma.no", ""], resolver, cache)
+        self.assertEqual(result, {"firma.no": True, "dead.no": False})
+        self.assertEqual(resolver.calls, 2)
+
+        # Andre runde besvares fra cachen
+        self.assertEqual(check_mx_domains(["firma.no", "dead.no"], resolver, cache), result)
+        self.assertEqual(resolver.calls, 2)
+        self.assertEqual(len(cache), 2)
+
+    def test_resolver_error_is_unknown(self):
+        def failing(domain):
+            raise OSError("SERVFAIL")
+
+        self.assertEqual(check_mx_domains(["firma.no"], failing, DnsCache()), {"firma.no": None})
+
+
+class PenaltyTest(unittest.TestCase):
+    def test_only_dead_domains_are_penalized(self):
+        resolver = StubResolver({"dead.no": False, "servfail.no": None})
+        leads = [
+            {"notes": "Post@Firma.no", "potentialScore": 80},
+            {"notes": "post@dead.no", "potentialScore": 80},
+            {"notes": "post@servfail.no", "potentialScore": 80},
+            {"notes": "ugyldig@", "potentialScore": 80},
+        ]
+        stats = _enrich(leads, resolver)
+        self.assertEqual([l["potentialScore"] for l in leads], [80, 80 - DEAD_DOMAIN_PENALTY, 80, 80])
+        self.assertEqual(leads[0]["notes"], "post@firma.no")
+        self.assertEqual((stats["ok"], stats["dodt_domene"], stats["ukjent"], stats["ugyldig"]), (1, 1, 1, 1))
+
+    def test_penalty_is_idempotent(self):
+        lead = {"notes": "post@dead.no", "potentialScore": 80}
+        _enrich([lead], StubResolver({"dead.no": False}))
+        _enrich([lead], StubResolver({"dead.no": False}))
+        self.assertEqual(lead["potentialScore"], 80 - DEAD_DOMAIN_PENALTY)
+
+        # Ukjent svar endrer ikke statusen; domene som lever igjen gir trekket tilbake
+        _enrich([lead], StubResolver({"dead.no": None}))
+        self.assertEqual(lead["potentialScore"], 80 - DEAD_DOMAIN_PENALTY)
+        _enrich([lead], StubResolver({"dead.no": True}))
+        self.assertEqual(lead["potentialScore"], 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
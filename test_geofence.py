@@ -0,0 +1,58 @@
+"""
+Tester for geofence.py: rutenett-indeksen skal gi samme svar som en ren
+punkt-i-polygon-test for alle punkter.
+
+Kjør:
+    python -m unittest test_geofence
+"""
+
+import unittest
+
+from geofence import Geofence, _point_in_polygons
+
+# Skrå trekant (ingen kanter langs rutenettet) og et polygon med hull
+TRIANGLE = [[[[0.0, 0.0], [0.21, 0.047], [0.013, 0.19], [0.0, 0.0]]]]
+WITH_HOLE = [[
+    [[0.3, 0.02], [0.52, 0.06], [0.47, 0.24], [0.28, 0.2], [0.3, 0.02]],
+    [[0.36, 0.08], [0.44, 0.1], [0.4, 0.17], [0.36, 0.08]],
+]]
+
+
+def _expected(areas: dict, lon: float, lat: float):
+    for nr, polygons in areas.items():
+        if _point_in_polygons(lon, lat, polygons):
+            return nr
+    return None
+
+
+class GeofenceIndexTest(unittest.TestCase):
+    def assert_matches_brute_force(self, areas: dict, steps: int = 300):
+        fence = Geofence(areas)
+        points = [pt for polygons in areas.values() for polygon in polygons for pt in polygon[0]]
+        min_x, max_x = min(p[0] for p in points) - 0.01, max(p[0] for p in points) + 0.01
+        min_y, max_y = min(p[1] for p in points) - 0.01, max(p[1] for p in points) + 0.01
+        wrong = []
+        for i in range(steps + 1):
+            lon = min_x + (max_x - min_x) * i / steps
+            for j in range(steps + 1):
+                lat = min_y + (max_y - min_y) * j / steps
+                if fence.locate(lat, lon) != _expected(areas, lon, lat):
+                    wrong.append((lat, lon))
+        self.assertEqual(wrong[:5], [], f"{len(wrong)} feil av {(steps + 1) ** 2} punkter")
+
+    def test_skewed_triangle(self):
+        self.assert_matches_brute_force({"0001": TRIANGLE})
+
+    def test_polygon_with_hole(self):
+        self.assert_matches_brute_force({"0002": WITH_HOLE})
+
+    def test_neighbouring_areas(self):
+        self.assert_matches_brute_force({"0001": TRIANGLE, "0002": WITH_HOLE})
+
+    def test_index_uses_full_cells(self):
+        # Snarveien skal fortsatt brukes for celler helt inne i området
+        self.assertTrue(Geofence({"0002": WITH_HOLE}).full_cells)
+
+
+if __name__ == "__main__":
+    unittest.main()